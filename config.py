@@ -4,16 +4,118 @@ config.py
 Loads environment variables using python-dotenv (.env) and sets up
 global constants for Azure OpenAI, Azure Storage, and Azure Cognitive Search.
 
-Raises EnvironmentError if a required variable is missing.
+The parsed .env values are snapshotted into a _config_cache.py next to the
+.env file, keyed on the .env file's mtime and size, so an unchanged .env is not re-parsed on every
+import (e.g. every Streamlit rerun). If a baked config_frozen.py is present
+(see scripts/bake_config.py), its constants are used and .env is skipped.
+
+Constants are resolved lazily on first attribute access, so code paths that
+only touch one service do not require the others to be configured.
+Raises EnvironmentError when a missing required variable is accessed.
 """
 
 import os
 import logging
-from dotenv import load_dotenv
+import importlib.util
+from dotenv import load_dotenv, dotenv_values
+from config_vars import REQUIRED as _REQUIRED, OPTIONAL as _OPTIONAL
 
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+_ENV_PATH = ".env"
+_CACHE_NAME = "_config_cache.py"
+
+
+def _cache_path() -> str:
+    """
+    Returns the snapshot path for the current .env: the cache sits beside the
+    .env it was parsed from, so each working directory keeps its own.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(_ENV_PATH)), _CACHE_NAME)
+
+
+def _env_stamp():
+    """
+    Returns the (st_mtime_ns, st_size) key of the .env file,
+    or None if there is no .env in the working directory.
+    """
+    try:
+        stat = os.stat(_ENV_PATH)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _load_cached_env(stamp):
+    """
+    Loads the snapshotted .env values from _config_cache.py.
+
+    Returns:
+        dict | None: The cached values, or None if the cache is missing,
+        unreadable, or was generated for a different .env stamp.
+    """
+    cache_path = _cache_path()
+    if stamp is None or not os.path.exists(cache_path):
+        return None
+    try:
+        spec = importlib.util.spec_from_file_location("_config_cache", cache_path)
+        cache = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(cache)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable config cache: {e}")
+        return None
+    if getattr(cache, "ENV_STAMP", None) != stamp:
+        return None
+    return cache.ENV_VALUES
+
+
+def _write_env_cache(stamp, values):
+    """
+    Writes the parsed .env values to _config_cache.py as literal constants.
+    Failing to write the cache is not fatal; the next import re-parses .env.
+    """
+    cache_path = _cache_path()
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("# Generated by config.py from .env -- do not edit or commit.\n")
+            f.write(f"ENV_STAMP = {stamp!r}\n")
+            f.write(f"ENV_VALUES = {values!r}\n")
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write config cache: {e}")
+
+
+def _load_env():
+    """
+    Populates os.environ from .env, preferring the cached snapshot.
+    Like load_dotenv(), existing environment variables are never overridden.
+    """
+    stamp = _env_stamp()
+    values = _load_cached_env(stamp)
+    if values is None:
+        if stamp is None:
+            # No .env in the working directory: keep python-dotenv's own lookup.
+            load_dotenv()
+            return
+        values = dict(dotenv_values(_ENV_PATH))
+        _write_env_cache(stamp, values)
+
+    for key, val in values.items():
+        if val is not None:
+            os.environ.setdefault(key, val)
+
+
+# A config_frozen.py baked by scripts/bake_config.py (e.g. in a production image)
+# supplies every constant as a literal, so .env is not read at all.
+try:
+    from config_frozen import *  # noqa: F401,F403
+    _FROZEN = True
+except ImportError:
+    _FROZEN = False
+
+if not _FROZEN:
+    _load_env()
 
 def get_env_variable(var_name: str) -> str:
     """
@@ -32,30 +134,46 @@ def get_env_variable(var_name: str) -> str:
         raise EnvironmentError(f"Env var '{var_name}' is not set.")
     return val
 
-# Azure OpenAI credentials
-try:
-    AZURE_OPENAI_API_KEY = get_env_variable('AZURE_OPENAI_API_KEY')
-    AZURE_OPENAI_ENDPOINT = get_env_variable('AZURE_OPENAI_ENDPOINT')
-    AZURE_OPENAI_DEPLOYMENT_NAME = get_env_variable('AZURE_OPENAI_DEPLOYMENT_NAME')
-    AZURE_OPENAI_MODEL_VERSION = get_env_variable('AZURE_OPENAI_MODEL_VERSION')
-    AZURE_OPENAI_EMBEDDING_NAME = get_env_variable('AZURE_OPENAI_EMBEDDING_NAME')
-except EnvironmentError as e:
-    logger.critical(f"Critical Azure OpenAI config error: {e}")
-    raise
-
-# Azure Blob Storage
-try:
-    AZURE_STORAGE_CONNECTION_STRING = get_env_variable('AZURE_STORAGE_CONNECTION_STRING')
-    BLOB_CONTAINER_NAME = get_env_variable('BLOB_CONTAINER_NAME')
-except EnvironmentError as e:
-    logger.critical(f"Critical Azure Blob config error: {e}")
-    raise
+def get_optional_variable(var_name: str):
+    """
+    Retrieve an optional environment variable, falling back to its default.
+    Raise EnvironmentError if the value cannot be converted to the default's type.
 
-# Azure Cognitive Search
-try:
-    SEARCH_ENDPOINT = get_env_variable('SEARCH_ENDPOINT')
-    SEARCH_ADMIN_KEY = get_env_variable('SEARCH_ADMIN_KEY')
-    SEARCH_INDEX_NAME = get_env_variable('SEARCH_INDEX_NAME')
-except EnvironmentError as e:
-    logger.critical(f"Critical Azure Search config error: {e}")
-    raise
+    Args:
+        var_name (str): The optional variable key (must be in _OPTIONAL).
+
+    Returns:
+        The converted value, or the default if the variable is not set.
+    """
+    default = _OPTIONAL[var_name]
+    val = os.getenv(var_name)
+    if not val:
+        return default
+    try:
+        return type(default)(val)
+    except ValueError:
+        logger.error(f"Environment variable '{var_name}' has an invalid value: {val!r}")
+        raise EnvironmentError(f"Env var '{var_name}' must be {type(default).__name__}, got {val!r}.")
+
+def __getattr__(name: str):
+    """
+    Resolves a config constant on first access (PEP 562) and memoizes it
+    as a module global, so later reads are plain attribute lookups.
+
+    Raises:
+        AttributeError: If name is not a known config constant.
+        EnvironmentError: If a required variable is not set, or an optional
+            variable has an invalid value.
+    """
+    if name in _OPTIONAL:
+        val = get_optional_variable(name)
+    elif name in _REQUIRED:
+        try:
+            val = get_env_variable(name)
+        except EnvironmentError as e:
+            logger.critical(f"Critical {_REQUIRED[name]} config error: {e}")
+            raise
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = val
+    return val
@@ -0,0 +1,33 @@
+"""
+config_vars.py
+
+Declares the configuration variables read by config.py. Kept free of side
+effects (no .env loading) so tools such as scripts/bake_config.py can list
+the variables without importing config.
+"""
+
+# Required variables, mapped to the service they configure (used in error logs).
+REQUIRED = {
+    'AZURE_OPENAI_API_KEY': 'Azure OpenAI',
+    'AZURE_OPENAI_ENDPOINT': 'Azure OpenAI',
+    'AZURE_OPENAI_DEPLOYMENT_NAME': 'Azure OpenAI',
+    'AZURE_OPENAI_MODEL_VERSION': 'Azure OpenAI',
+    'AZURE_OPENAI_EMBEDDING_NAME': 'Azure OpenAI',
+    'AZURE_STORAGE_CONNECTION_STRING': 'Azure Blob',
+    'BLOB_CONTAINER_NAME': 'Azure Blob',
+    'SEARCH_ENDPOINT': 'Azure Search',
+    'SEARCH_ADMIN_KEY': 'Azure Search',
+    'SEARCH_INDEX_NAME': 'Azure Search',
+}
+
+# Optional tuning variables, mapped to their defaults. Set values are
+# converted to the default's type.
+OPTIONAL = {
+    'EMBED_MAX_CONCURRENCY': 5,
+    'BLOB_MAX_CONCURRENCY': 4,
+    'CHUNK_CACHE_PATH': '',  # empty: chunk cache disabled
+    'CONTEXT_TOKEN_BUDGET': 1500,
+    'SPLITTER_EMBED_MODEL': '',  # empty: the splitter uses the Azure embedding model
+    'CHUNK_STRATEGY': 'semantic',  # or 'token'
+    'EMBEDDING_DIMENSIONS': 0,  # 0: accept any query embedding length
+}
@@ -11,7 +11,9 @@ import openai
 import logging
 
 import config  # We'll rely on config.py for Azure OpenAI keys, search endpoint, etc.
-from utils.agent_tools import rag_pipeline  # We'll reuse the RAG logic here
+from utils.agent_tools import (  # We'll reuse the RAG logic here
+    rag_pipeline, get_shared_chunker, NO_CHUNKS_ANSWER, NO_RESPONSE_ANSWER,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -21,21 +23,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@st.cache_resource
+def _init_openai():
+    """
+    Sets the global Azure OpenAI credentials once per process rather than on
+    every Streamlit rerun.
+    """
+    openai.api_type = "azure"
+    openai.api_key = config.AZURE_OPENAI_API_KEY
+    openai.api_base = config.AZURE_OPENAI_ENDPOINT
+    openai.api_version = config.AZURE_OPENAI_MODEL_VERSION
+    return True
+
+# Bump to invalidate cached answers (e.g. after re-indexing the PDFs or changing prompts).
+ANSWER_CACHE_VERSION = 1
+
+class _UncachedResult(Exception):
+    """
+    Carries a fallback (answer, chunks) result out of cached_rag. st.cache_data
+    does not store raised exceptions, so fallbacks are never cached.
+    """
+
+    def __init__(self, result):
+        super().__init__("RAG pipeline returned a fallback result.")
+        self.result = result
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_rag(q: str, index_name: str, cache_version: int):
+    final_answer, top_chunks = result = rag_pipeline(q, chunker=get_shared_chunker())
+    if not top_chunks or final_answer in (NO_CHUNKS_ANSWER, NO_RESPONSE_ANSWER):
+        raise _UncachedResult(result)
+    return result
+
+def cached_rag(q: str, index_name: str, cache_version: int = ANSWER_CACHE_VERSION):
+    """
+    Runs the RAG pipeline for q, memoizing the (answer, chunks) result for an hour
+    so repeated questions (from any session) skip embedding, search and the LLM call.
+    Fallback results (no chunks found, no answer generated) are not cached, so
+    newly indexed documents are picked up on the next ask.
+
+    index_name and cache_version only take part in the cache key, so answers are
+    not reused across indexes or after a version bump.
+    """
+    try:
+        return _cached_rag(q, index_name, cache_version)
+    except _UncachedResult as fallback:
+        return fallback.result
+
 def main():
     """
     Entry point for the Streamlit app.
 
     Steps:
-    1) Set Azure OpenAI credentials.
+    1) Set Azure OpenAI credentials (first run only).
     2) Create a text input for the user's query.
-    3) Call the RAG pipeline to get an answer and relevant chunks.
+    3) Call the (cached) RAG pipeline to get an answer and relevant chunks.
     4) Display the final answer and show relevant chunks in an expander.
     """
-    # Set up Azure OpenAI credentials
-    openai.api_type = "azure"
-    openai.api_key = config.AZURE_OPENAI_API_KEY
-    openai.api_base = config.AZURE_OPENAI_ENDPOINT
-    openai.api_version = config.AZURE_OPENAI_MODEL_VERSION
+    # Set up Azure OpenAI credentials (once per process)
+    _init_openai()
 
     st.set_page_config(page_title="PDF RAG Demo", page_icon="🤖", layout="wide")
     st.title("PDF RAG Assistant")
@@ -45,7 +91,7 @@ def main():
     if user_question:
         try:
             # RAG pipeline returns (answer, chunks)
-            final_answer, top_chunks = rag_pipeline(user_question)
+            final_answer, top_chunks = cached_rag(user_question, config.SEARCH_INDEX_NAME)
             st.markdown("**Answer:**")
             st.write(final_answer)
 
@@ -0,0 +1,83 @@
+"""
+bake_config.py
+
+Bakes the application's configuration into config_frozen.py, a module of plain
+constants that config.py imports in place of parsing .env at runtime,
+and byte-compiles it so the interpreter can load it straight from its .pyc.
+
+Run with the same optimization flag used in production, e.g.:
+
+    python -O scripts/bake_config.py [path/to/.env]
+
+Environment variables take precedence over .env values, as with load_dotenv().
+Raises EnvironmentError if a required variable is missing.
+"""
+
+import os
+import sys
+import logging
+import py_compile
+from dotenv import dotenv_values
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Only the variable declarations: importing config would load the working
+# directory's .env into os.environ and override the file being baked.
+from config_vars import REQUIRED, OPTIONAL  # noqa: E402  (needs ROOT_DIR on sys.path)
+
+logger = logging.getLogger(__name__)
+
+FROZEN_PATH = os.path.join(ROOT_DIR, "config_frozen.py")
+
+
+def bake(env_path: str = ".env", out_path: str = FROZEN_PATH) -> str:
+    """
+    Writes every required config variable (and any optional one that is set)
+    to out_path as a literal and byte-compiles the result.
+
+    Args:
+        env_path (str): The .env file to read (missing files are treated as empty).
+        out_path (str): Where to write the frozen config module.
+
+    Returns:
+        str: The path of the compiled .pyc file.
+
+    Raises:
+        EnvironmentError: If a required variable is neither in the environment nor in .env.
+    """
+    dotenv = dotenv_values(env_path) if os.path.exists(env_path) else {}
+    values = {}
+    for name in sorted(REQUIRED):
+        value = os.environ.get(name) or dotenv.get(name)
+        if not value:
+            raise EnvironmentError(f"Env var '{name}' is not set.")
+        values[name] = value
+    # Optional variables are only baked when set; otherwise config.py's default applies.
+    for name, default in sorted(OPTIONAL.items()):
+        value = os.environ.get(name) or dotenv.get(name)
+        if value:
+            try:
+                values[name] = type(default)(value)
+            except ValueError:
+                raise EnvironmentError(f"Env var '{name}' must be {type(default).__name__}, got {value!r}.")
+
+    names = sorted(values)
+    lines = [
+        "# Generated by scripts/bake_config.py -- do not edit or commit.",
+        f"__all__ = {names!r}",
+    ]
+    for name in names:
+        lines.append(f"{name} = {values[name]!r}")
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+    pyc_path = py_compile.compile(out_path, doraise=True)
+    logger.info(f"Baked {len(names)} config values into {out_path}.")
+    return pyc_path
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    bake(sys.argv[1] if len(sys.argv) > 1 else ".env")
@@ -2,19 +2,54 @@
 test_agent_tools.py
 
 Pytest tests for agent_tools.py, specifically the rag_pipeline function:
-1) Creates a PDFChunker and obtains a query embedding.
+1) Gets the shared PDFChunker and obtains a query embedding.
 2) Searches Azure for relevant chunks.
 3) Calls Azure OpenAI with those chunks to get a final answer.
 4) Handles edge cases like no embedding, no chunks, or exceptions.
 """
 
+import asyncio
 import pytest
 import logging
-from unittest.mock import patch, MagicMock
-from utils.agent_tools import rag_pipeline
+import numpy as np
+from unittest.mock import patch, Mock, AsyncMock
+import config
+from utils.pdf_chunk_processing import PDFChunker
+from utils.agent_tools import (
+    rag_pipeline,
+    arag_pipeline,
+    rag_pipeline_batch,
+    _QUERY_EMBEDDINGS,
+    _ANSWERS,
+    get_shared_chunker,
+)
+
+@pytest.fixture(autouse=True)
+def pin_chunker_config(monkeypatch):
+    """
+    Pins the optional chunker settings, so a developer's environment or .env
+    can't change the PDFChunker the tests build.
+    """
+    monkeypatch.setattr(config, "CHUNK_CACHE_PATH", "", raising=False)
+    monkeypatch.setattr(config, "CHUNK_STRATEGY", "semantic", raising=False)
+    monkeypatch.setattr(config, "SPLITTER_EMBED_MODEL", "", raising=False)
+
+
+@pytest.fixture(autouse=True)
+def clear_embedding_cache():
+    """
+    Each test starts with empty embedding/answer caches and no shared chunker.
+    """
+    _QUERY_EMBEDDINGS.clear()
+    _ANSWERS.clear()
+    get_shared_chunker.cache_clear()
+    yield
+    _QUERY_EMBEDDINGS.clear()
+    _ANSWERS.clear()
+    get_shared_chunker.cache_clear()
 
 @patch("utils.agent_tools.call_azure_openai")
-@patch("utils.agent_tools.query_azure_search")
+@patch("utils.agent_tools.query_azure_search_cached")
 @patch("utils.agent_tools.PDFChunker")
 def test_rag_pipeline_success(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
     """
@@ -23,7 +58,7 @@ def test_rag_pipeline_success(mock_pdfchunker, mock_query_azure_search, mock_cal
     - The search returns chunks.
     - call_azure_openai returns a final answer.
     """
-    chunker_instance = MagicMock()
+    chunker_instance = Mock()
     # Suppose the embedding is [0.1, 0.2]
     chunker_instance.embed_model.get_text_embedding.return_value = [0.1, 0.2]
     mock_pdfchunker.return_value = chunker_instance
@@ -39,22 +74,25 @@ def test_rag_pipeline_success(mock_pdfchunker, mock_query_azure_search, mock_cal
     # Validate calls
     mock_pdfchunker.assert_called_once()
     chunker_instance.embed_model.get_text_embedding.assert_called_once_with("What is in the PDF?")
-    mock_query_azure_search.assert_called_once_with([0.1, 0.2])
-    mock_call_azure_openai.assert_called_once_with("What is in the PDF?", ["chunk1", "chunk2"])
+    mock_query_azure_search.assert_called_once()
+    (query_embedding,), _ = mock_query_azure_search.call_args
+    assert query_embedding.dtype == np.float32
+    np.testing.assert_allclose(query_embedding, [0.1, 0.2])
+    mock_call_azure_openai.assert_called_once_with("What is in the PDF?", ("chunk1", "chunk2"))
 
     # Validate results
     assert answer == "Some final answer"
-    assert chunks == ["chunk1", "chunk2"]
+    assert chunks == ("chunk1", "chunk2")
 
 
 @patch("utils.agent_tools.call_azure_openai")
-@patch("utils.agent_tools.query_azure_search")
+@patch("utils.agent_tools.query_azure_search_cached")
 @patch("utils.agent_tools.PDFChunker")
 def test_rag_pipeline_empty_embedding(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
     """
     If the embedding returned is None or empty, the pipeline should raise ValueError.
     """
-    chunker_instance = MagicMock()
+    chunker_instance = Mock()
     # Return an empty embedding
     chunker_instance.embed_model.get_text_embedding.return_value = []
     mock_pdfchunker.return_value = chunker_instance
@@ -69,13 +107,13 @@ def test_rag_pipeline_empty_embedding(mock_pdfchunker, mock_query_azure_search,
 
 
 @patch("utils.agent_tools.call_azure_openai")
-@patch("utils.agent_tools.query_azure_search")
+@patch("utils.agent_tools.query_azure_search_cached")
 @patch("utils.agent_tools.PDFChunker")
 def test_rag_pipeline_no_chunks(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
     """
     If the search returns no chunks, we return a fallback message and empty list.
     """
-    chunker_instance = MagicMock()
+    chunker_instance = Mock()
     # Non-empty embedding
     chunker_instance.embed_model.get_text_embedding.return_value = [0.5, 0.6]
     mock_pdfchunker.return_value = chunker_instance
@@ -86,20 +124,20 @@ def test_rag_pipeline_no_chunks(mock_pdfchunker, mock_query_azure_search, mock_c
     answer, chunks = rag_pipeline("Any question")
 
     assert answer == "No relevant information found in the PDF docs."
-    assert chunks == []
+    assert chunks == ()
 
     # We never call openai if we have zero chunks
     mock_call_azure_openai.assert_not_called()
 
 
 @patch("utils.agent_tools.call_azure_openai")
-@patch("utils.agent_tools.query_azure_search")
+@patch("utils.agent_tools.query_azure_search_cached")
 @patch("utils.agent_tools.PDFChunker")
 def test_rag_pipeline_no_final_response(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
     """
     If call_azure_openai returns no final response, we return a fallback message.
     """
-    chunker_instance = MagicMock()
+    chunker_instance = Mock()
     chunker_instance.embed_model.get_text_embedding.return_value = [0.9, 1.0]
     mock_pdfchunker.return_value = chunker_instance
 
@@ -109,20 +147,20 @@ def test_rag_pipeline_no_final_response(mock_pdfchunker, mock_query_azure_search
 
     answer, chunks = rag_pipeline("Where are my docs?")
     assert answer == "No response generated. Please refine your query."
-    assert chunks == ["chunkA"]  # We still return the chunk list
+    assert chunks == ("chunkA",)  # We still return the chunk list
 
-    mock_call_azure_openai.assert_called_once_with("Where are my docs?", ["chunkA"])
+    mock_call_azure_openai.assert_called_once_with("Where are my docs?", ("chunkA",))
 
 
 @patch("utils.agent_tools.call_azure_openai")
-@patch("utils.agent_tools.query_azure_search")
+@patch("utils.agent_tools.query_azure_search_cached")
 @patch("utils.agent_tools.PDFChunker")
 def test_rag_pipeline_exception(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
     """
     If any unexpected exception occurs (like a network failure),
     we raise ValueError("Failed RAG pipeline.").
     """
-    chunker_instance = MagicMock()
+    chunker_instance = Mock()
     chunker_instance.embed_model.get_text_embedding.return_value = [0.1, 0.2]
     mock_pdfchunker.return_value = chunker_instance
 
@@ -134,3 +172,240 @@ def test_rag_pipeline_exception(mock_pdfchunker, mock_query_azure_search, mock_c
         rag_pipeline("Check error handling")
 
     assert "Failed RAG pipeline." in str(exc_info.value)
+
+
+@patch("utils.agent_tools.call_azure_openai")
+@patch("utils.agent_tools.query_azure_search_cached")
+@patch("utils.agent_tools.PDFChunker")
+def test_rag_pipeline_uses_injected_chunker(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
+    """
+    If a chunker is passed in, the pipeline uses it instead of the shared PDFChunker.
+    """
+    chunker_instance = Mock()
+    chunker_instance.embed_model.get_text_embedding.return_value = [0.3, 0.4]
+    mock_query_azure_search.return_value = ["chunk1"]
+    mock_call_azure_openai.return_value = "Cached chunker answer"
+
+    answer, chunks = rag_pipeline("Reuse the chunker", chunker=chunker_instance)
+
+    mock_pdfchunker.assert_not_called()
+    chunker_instance.embed_model.get_text_embedding.assert_called_once_with("Reuse the chunker")
+    assert answer == "Cached chunker answer"
+    assert chunks == ("chunk1",)
+
+
+@patch("utils.agent_tools.call_azure_openai")
+@patch("utils.agent_tools.query_azure_search_cached")
+@patch("utils.agent_tools.PDFChunker")
+def test_rag_pipeline_reuses_shared_chunker(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
+    """
+    Without an injected chunker, every query shares one PDFChunker instance.
+    """
+    mock_pdfchunker.return_value.embed_model.get_text_embedding.return_value = [0.1, 0.2]
+    mock_query_azure_search.return_value = ["chunk1"]
+    mock_call_azure_openai.return_value = "Shared chunker answer"
+
+    rag_pipeline("First question")
+    rag_pipeline("Second question")
+
+    mock_pdfchunker.assert_called_once()
+    assert get_shared_chunker() is mock_pdfchunker.return_value
+
+
+@patch("utils.agent_tools.call_azure_openai")
+@patch("utils.agent_tools.query_azure_search_cached")
+@patch("utils.agent_tools.PDFChunker")
+def test_rag_pipeline_caches_query_embedding(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
+    """
+    Repeating a query reuses the cached embedding instead of calling the embed model again.
+    """
+    chunker_instance = Mock()
+    chunker_instance.embed_model.get_text_embedding.return_value = [0.7, 0.8]
+    mock_query_azure_search.return_value = ["chunk1"]
+    mock_call_azure_openai.return_value = "Some final answer"
+
+    rag_pipeline("Same question", chunker=chunker_instance)
+    rag_pipeline("Same question", chunker=chunker_instance)
+
+    chunker_instance.embed_model.get_text_embedding.assert_called_once_with("Same question")
+    assert mock_query_azure_search.call_count == 2
+    first_call, second_call = mock_query_azure_search.call_args_list
+    assert first_call.args[0] is second_call.args[0]
+
+
+@patch("utils.agent_tools.call_azure_openai")
+@patch("utils.agent_tools.query_azure_search_cached")
+@patch("utils.agent_tools.PDFChunker")
+def test_rag_pipeline_caches_answers_by_normalized_query(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
+    """
+    Queries differing only in case/whitespace share the embedding and the answer,
+    as long as the search returns the same chunks.
+    """
+    chunker_instance = Mock()
+    chunker_instance.embed_model.get_text_embedding.return_value = [0.7, 0.8]
+    mock_query_azure_search.return_value = ["chunk1"]
+    mock_call_azure_openai.return_value = "Cached answer"
+
+    first = rag_pipeline("What is  RAG?", chunker=chunker_instance)
+    second = rag_pipeline("  what is rag? ", chunker=chunker_instance)
+
+    assert first == second == ("Cached answer", ("chunk1",))
+    chunker_instance.embed_model.get_text_embedding.assert_called_once()
+    mock_call_azure_openai.assert_called_once()
+
+    # Different chunks for the same question get a fresh answer.
+    mock_query_azure_search.return_value = ["chunk2"]
+    rag_pipeline("What is RAG?", chunker=chunker_instance)
+    assert mock_call_azure_openai.call_count == 2
+
+
+@patch("utils.agent_tools.acall_azure_openai", new_callable=AsyncMock)
+@patch("utils.agent_tools.query_azure_search_cached")
+@patch("utils.agent_tools.PDFChunker")
+def test_arag_pipeline_success(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
+    """
+    arag_pipeline awaits the async embedding and chat calls and returns (answer, chunks).
+    """
+    chunker_instance = Mock()
+    chunker_instance.embed_model.aget_text_embedding = AsyncMock(return_value=[0.1, 0.2])
+    mock_query_azure_search.return_value = ["chunk1"]
+    mock_call_azure_openai.return_value = "Async answer"
+
+    answer, chunks = asyncio.run(arag_pipeline("Async question", chunker=chunker_instance))
+
+    assert answer == "Async answer"
+    assert chunks == ("chunk1",)
+    mock_call_azure_openai.assert_awaited_once_with("Async question", ("chunk1",))
+    chunker_instance.embed_model.get_text_embedding.assert_not_called()
+
+
+@patch("utils.agent_tools.acall_azure_openai", new_callable=AsyncMock)
+@patch("utils.agent_tools.query_azure_search_cached")
+@patch("utils.agent_tools.PDFChunker")
+def test_rag_pipeline_batch_success(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
+    """
+    Batched queries are deduplicated, embedded in one call, and answered in input order.
+    """
+    chunker_instance = Mock()
+    chunker_instance.embed_model.aget_text_embedding_batch = AsyncMock(return_value=[[0.1, 0.2], [0.3, 0.4]])
+    mock_pdfchunker.return_value = chunker_instance
+
+    mock_query_azure_search.side_effect = lambda emb: [f"chunk for {emb[0]:.1f}"]
+    mock_call_azure_openai.side_effect = lambda query, chunks: f"answer to {query}"
+
+    results = rag_pipeline_batch(["Q1", "Q2", "Q1"])
+
+    chunker_instance.embed_model.aget_text_embedding_batch.assert_awaited_once_with(["Q1", "Q2"])
+    assert mock_query_azure_search.call_count == 2
+    assert results == [
+        ("answer to Q1", ("chunk for 0.1",)),
+        ("answer to Q2", ("chunk for 0.3",)),
+        ("answer to Q1", ("chunk for 0.1",)),
+    ]
+
+
+@patch("utils.agent_tools.call_azure_openai", return_value="Batch answer")
+@patch("utils.agent_tools.acall_azure_openai", new_callable=AsyncMock)
+@patch("utils.agent_tools.query_azure_search_cached")
+@patch("utils.agent_tools.PDFChunker")
+def test_rag_pipeline_batch_uses_embedding_cache(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai, mock_sync_call):
+    """
+    Batched queries share the query-embedding cache: only uncached queries are
+    embedded, and repeating a batch makes no embedding call at all.
+    """
+    chunker_instance = Mock()
+    chunker_instance.embed_model.get_text_embedding.return_value = [0.5, 0.6]
+    chunker_instance.embed_model.aget_text_embedding_batch = AsyncMock(return_value=[[0.1, 0.2], [0.3, 0.4]])
+    mock_pdfchunker.return_value = chunker_instance
+    mock_query_azure_search.return_value = ["chunk1"]
+    mock_call_azure_openai.return_value = "Batch answer"
+
+    rag_pipeline("  q0 ")  # cached by the single-query pipeline
+    rag_pipeline_batch(["Q0", "Q1", "Q2"])
+    chunker_instance.embed_model.aget_text_embedding_batch.assert_awaited_once_with(["Q1", "Q2"])
+
+    results = rag_pipeline_batch(["q1", "Q2 ", "Q0"])
+
+    chunker_instance.embed_model.aget_text_embedding_batch.assert_awaited_once()
+    chunker_instance.embed_model.get_text_embedding.assert_called_once()
+    assert [answer for answer, _ in results] == ["Batch answer"] * 3
+
+
+@patch("utils.agent_tools.acall_azure_openai", new_callable=AsyncMock)
+@patch("utils.agent_tools.query_azure_search_cached")
+@patch("utils.agent_tools.PDFChunker")
+def test_rag_pipeline_batch_empty_embedding(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
+    """
+    If any batched embedding is empty, the batch raises ValueError before searching.
+    """
+    chunker_instance = Mock()
+    chunker_instance.embed_model.aget_text_embedding_batch = AsyncMock(return_value=[[0.1, 0.2], []])
+    mock_pdfchunker.return_value = chunker_instance
+
+    with pytest.raises(ValueError) as exc_info:
+        rag_pipeline_batch(["Q1", "Q2"])
+
+    assert "Query embedding is empty or invalid." in str(exc_info.value)
+    mock_query_azure_search.assert_not_called()
+    mock_call_azure_openai.assert_not_called()
+
+
+@patch("utils.agent_tools.acall_azure_openai", new_callable=AsyncMock)
+@patch("utils.agent_tools.query_azure_search_cached")
+@patch("utils.agent_tools.PDFChunker")
+def test_arag_pipeline_shares_embedding_cache(mock_pdfchunker, mock_query_azure_search, mock_call_azure_openai):
+    """
+    An embedding computed by the sync pipeline is reused by arag_pipeline.
+    """
+    chunker_instance = Mock()
+    chunker_instance.embed_model.get_text_embedding.return_value = [0.1, 0.2]
+    chunker_instance.embed_model.aget_text_embedding = AsyncMock(return_value=[0.9, 0.9])
+    mock_query_azure_search.return_value = ["chunk1"]
+    mock_call_azure_openai.return_value = "Async answer"
+
+    with patch("utils.agent_tools.call_azure_openai", return_value="Sync answer"):
+        rag_pipeline("Same question", chunker=chunker_instance)
+    asyncio.run(arag_pipeline("Same question", chunker=chunker_instance))
+
+    chunker_instance.embed_model.aget_text_embedding.assert_not_awaited()
+    assert mock_query_azure_search.call_args.args[0].tolist() == pytest.approx([0.1, 0.2])
+
+
+@patch("utils.agent_tools.call_azure_openai")
+@patch("utils.agent_tools.query_azure_search_cached")
+@patch("llama_index.embeddings.azure_openai.AzureOpenAIEmbedding.get_text_embedding", return_value=[0.1, 0.2])
+def test_rag_pipeline_with_real_embed_model(mock_get_embedding, mock_query_azure_search, mock_call_azure_openai):
+    """
+    The real AzureOpenAIEmbedding (a pydantic model) is not hashable, unlike Mock;
+    the embedding cache must still work with it, and repeated queries must hit it.
+    """
+    chunker = PDFChunker()
+    mock_query_azure_search.return_value = ["chunk1"]
+    mock_call_azure_openai.return_value = "Real model answer"
+
+    first = rag_pipeline("What is RAG?", chunker=chunker)
+    second = rag_pipeline("what is rag?", chunker=chunker)
+
+    assert first == second == ("Real model answer", ("chunk1",))
+    mock_get_embedding.assert_called_once_with("What is RAG?")
+
+
+@patch("utils.agent_tools.acall_azure_openai", new_callable=AsyncMock)
+@patch("utils.agent_tools.query_azure_search_cached")
+@patch("llama_index.embeddings.azure_openai.AzureOpenAIEmbedding.aget_text_embedding", new_callable=AsyncMock)
+def test_arag_pipeline_with_real_embed_model(mock_aget_embedding, mock_query_azure_search, mock_call_azure_openai):
+    """
+    arag_pipeline caches embeddings for the real (unhashable) AzureOpenAIEmbedding too,
+    sharing normalized-query entries across calls.
+    """
+    chunker = PDFChunker()
+    mock_aget_embedding.return_value = [0.1, 0.2]
+    mock_query_azure_search.return_value = ["chunk1"]
+    mock_call_azure_openai.return_value = "Real model async answer"
+
+    first = asyncio.run(arag_pipeline("What is RAG?", chunker=chunker))
+    second = asyncio.run(arag_pipeline("  what is RAG? ", chunker=chunker))
+
+    assert first == second == ("Real model async answer", ("chunk1",))
+    mock_aget_embedding.assert_awaited_once_with("What is RAG?")
+    mock_call_azure_openai.assert_awaited_once()
@@ -4,11 +4,13 @@ test_azure_blob.py
 Pytest tests for azure_blob.py, which implements a client for listing and retrieving PDF blobs from Azure Blob Storage.
 """
 
+import os
 import pytest
 import logging
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, Mock
+from azure.storage.blob import BlobServiceClient, ContainerClient, BlobClient, StorageStreamDownloader
+import tempfile
 from utils.azure_blob import AzureBlobClient
-from io import BytesIO
 
 @pytest.fixture
 def mock_config(monkeypatch):
@@ -17,6 +19,7 @@ def mock_config(monkeypatch):
     """
     monkeypatch.setattr("utils.azure_blob.config.AZURE_STORAGE_CONNECTION_STRING", "fake_connection_string")
     monkeypatch.setattr("utils.azure_blob.config.BLOB_CONTAINER_NAME", "fake_container")
+    monkeypatch.setattr("utils.azure_blob.config.BLOB_MAX_CONCURRENCY", 4, raising=False)
 
 #
 # Tests for __init__
@@ -27,7 +30,7 @@ def test_init_success(mock_from_conn, mock_config, caplog):
     If BlobServiceClient.from_connection_string succeeds,
     AzureBlobClient initializes with no error, logs success.
     """
-    fake_blob_service = MagicMock()
+    fake_blob_service = Mock(spec=BlobServiceClient)
     mock_from_conn.return_value = fake_blob_service
 
     with caplog.at_level(logging.INFO):
@@ -63,20 +66,20 @@ def test_list_pdf_blobs_success(mock_init, mock_config):
     we return only those with a .pdf extension.
     """
     client = AzureBlobClient()
-    client.blob_service_client = MagicMock()
+    client.blob_service_client = Mock(spec=BlobServiceClient)
     client.container_name = "fake_container"
 
-    fake_container_client = MagicMock()
+    fake_container_client = Mock(spec=ContainerClient)
     client.blob_service_client.get_container_client.return_value = fake_container_client
 
-    # Instead of MagicMock(name="report.pdf"), set .name explicitly
-    mock1 = MagicMock()
+    # Instead of Mock(name="report.pdf"), set .name explicitly
+    mock1 = Mock()
     mock1.name = "report.pdf"
 
-    mock2 = MagicMock()
+    mock2 = Mock()
     mock2.name = "image.png"
 
-    mock3 = MagicMock()
+    mock3 = Mock()
     mock3.name = "notes.pdf"
 
     blob_list = [mock1, mock2, mock3]
@@ -86,16 +89,68 @@ def test_list_pdf_blobs_success(mock_init, mock_config):
     assert result == ["report.pdf", "notes.pdf"]
     fake_container_client.list_blobs.assert_called_once()
 
+@patch.object(AzureBlobClient, "__init__", return_value=None)
+def test_list_pdf_blobs_with_prefix(mock_init, mock_config):
+    """
+    A prefix is passed to list_blobs as name_starts_with, and upper-case
+    .PDF extensions are included.
+    """
+    client = AzureBlobClient()
+    client.blob_service_client = Mock(spec=BlobServiceClient)
+    client.container_name = "fake_container"
+
+    fake_container_client = Mock(spec=ContainerClient)
+    client.blob_service_client.get_container_client.return_value = fake_container_client
+
+    mock1 = Mock()
+    mock1.name = "reports/q1.PDF"
+    mock2 = Mock()
+    mock2.name = "reports/q1.csv"
+    fake_container_client.list_blobs.return_value = [mock1, mock2]
+
+    result = client.list_pdf_blobs(prefix="reports/")
+    assert result == ["reports/q1.PDF"]
+    fake_container_client.list_blobs.assert_called_once_with(name_starts_with="reports/", results_per_page=5000)
+
+@patch.object(AzureBlobClient, "__init__", return_value=None)
+def test_iter_pdf_blobs_is_lazy(mock_init, mock_config):
+    """
+    iter_pdf_blobs yields PDF names as the listing is consumed,
+    without materializing the whole container listing first.
+    """
+    client = AzureBlobClient()
+    client.blob_service_client = Mock(spec=BlobServiceClient)
+    client.container_name = "fake_container"
+
+    fake_container_client = Mock(spec=ContainerClient)
+    client.blob_service_client.get_container_client.return_value = fake_container_client
+
+    consumed = []
+
+    def fake_listing():
+        for name in ["a.pdf", "b.txt", "c.pdf", "d.pdf"]:
+            consumed.append(name)
+            blob = Mock()
+            blob.name = name
+            yield blob
+
+    fake_container_client.list_blobs.return_value = fake_listing()
+
+    names = client.iter_pdf_blobs()
+    assert next(names) == "a.pdf"
+    assert consumed == ["a.pdf"]
+    assert list(names) == ["c.pdf", "d.pdf"]
+
 @patch.object(AzureBlobClient, "__init__", return_value=None)
 def test_list_pdf_blobs_failure(mock_init, caplog):
     """
     If listing blobs fails, we log error and raise.
     """
     client = AzureBlobClient()
-    client.blob_service_client = MagicMock()
+    client.blob_service_client = Mock(spec=BlobServiceClient)
     client.container_name = "fake_container"
 
-    fake_container_client = MagicMock()
+    fake_container_client = Mock(spec=ContainerClient)
     client.blob_service_client.get_container_client.return_value = fake_container_client
 
     fake_container_client.list_blobs.side_effect = Exception("List error")
@@ -112,49 +167,106 @@ def test_list_pdf_blobs_failure(mock_init, caplog):
 # Tests for get_pdf_stream
 #
 @patch.object(AzureBlobClient, "__init__", return_value=None)
-def test_get_pdf_stream_success(mock_init):
+def test_get_pdf_stream_success(mock_init, mock_config):
     """
-    If we download a PDF blob with some non-empty bytes, we return a BytesIO stream.
+    If we download a PDF blob with some non-empty bytes, we return a rewound spooled stream.
     """
     client = AzureBlobClient()
-    client.blob_service_client = MagicMock()
+    client.blob_service_client = Mock(spec=BlobServiceClient)
     client.container_name = "fake_container"
 
-    fake_container_client = MagicMock()
+    fake_container_client = Mock(spec=ContainerClient)
     client.blob_service_client.get_container_client.return_value = fake_container_client
-    fake_blob_client = MagicMock()
+    fake_blob_client = Mock(spec=BlobClient)
     fake_container_client.get_blob_client.return_value = fake_blob_client
 
     # Simulate a successful download of b"PDF BYTES"
-    fake_downloader = MagicMock()
-    fake_downloader.readall.return_value = b"PDF BYTES"
+    fake_downloader = Mock(spec=StorageStreamDownloader)
+    fake_downloader.readinto.side_effect = lambda stream: stream.write(b"PDF BYTES")
     fake_blob_client.download_blob.return_value = fake_downloader
 
     stream = client.get_pdf_stream("example.pdf")
-    assert isinstance(stream, BytesIO)
-    assert stream.getvalue() == b"PDF BYTES"
+    assert isinstance(stream, tempfile.SpooledTemporaryFile)
+    assert stream.tell() == 0, "Stream should be rewound for reading"
+    assert stream.read() == b"PDF BYTES"
 
     fake_container_client.get_blob_client.assert_called_once_with("example.pdf")
-    fake_downloader.readall.assert_called_once()
+    fake_blob_client.download_blob.assert_called_once_with(max_concurrency=4, validate_content=False)
+    fake_downloader.readinto.assert_called_once()
+
+
+@patch.object(AzureBlobClient, "__init__", return_value=None)
+def test_get_pdf_stream_spills_large_blobs_to_disk(mock_init, monkeypatch):
+    """
+    Blobs larger than _SPOOL_MAX_SIZE are spooled to a temporary file
+    instead of being held in memory.
+    """
+    monkeypatch.setattr("utils.azure_blob._SPOOL_MAX_SIZE", 4)
+    client = AzureBlobClient()
+    client.blob_service_client = Mock(spec=BlobServiceClient)
+    client.container_name = "fake_container"
+
+    fake_container_client = Mock(spec=ContainerClient)
+    client.blob_service_client.get_container_client.return_value = fake_container_client
+    fake_blob_client = Mock(spec=BlobClient)
+    fake_container_client.get_blob_client.return_value = fake_blob_client
+
+    fake_downloader = Mock(spec=StorageStreamDownloader)
+    fake_downloader.readinto.side_effect = lambda stream: stream.write(b"LARGE PDF BYTES")
+    fake_blob_client.download_blob.return_value = fake_downloader
+
+    stream = client.get_pdf_stream("large.pdf")
+    assert stream._rolled, "Stream should have rolled over to a temporary file"
+    assert stream.read() == b"LARGE PDF BYTES"
+    stream.close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="large blobs spool in memory on Windows")
+@patch.object(AzureBlobClient, "__init__", return_value=None)
+def test_get_pdf_stream_large_blob_uses_named_file(mock_init, monkeypatch):
+    """
+    A blob known to exceed _SPOOL_MAX_SIZE is downloaded into a named temporary
+    file, so the PDF can be opened by path; closing the stream removes it.
+    """
+    monkeypatch.setattr("utils.azure_blob._SPOOL_MAX_SIZE", 4)
+    client = AzureBlobClient()
+    client.blob_service_client = Mock(spec=BlobServiceClient)
+    client.container_name = "fake_container"
+
+    fake_container_client = Mock(spec=ContainerClient)
+    client.blob_service_client.get_container_client.return_value = fake_container_client
+    fake_blob_client = Mock(spec=BlobClient)
+    fake_container_client.get_blob_client.return_value = fake_blob_client
+
+    fake_downloader = Mock(spec=StorageStreamDownloader)
+    fake_downloader.size = len(b"LARGE PDF BYTES")
+    fake_downloader.readinto.side_effect = lambda stream: stream.write(b"LARGE PDF BYTES")
+    fake_blob_client.download_blob.return_value = fake_downloader
+
+    stream = client.get_pdf_stream("large.pdf")
+    assert isinstance(stream.name, str) and os.path.isfile(stream.name)
+    assert stream.read() == b"LARGE PDF BYTES"
+    stream.close()
+    assert not os.path.exists(stream.name)
 
 
 @patch.object(AzureBlobClient, "__init__", return_value=None)
 def test_get_pdf_stream_empty(mock_init):
     """
-    If the PDF blob is empty or readall() returns no bytes,
+    If the PDF blob is empty or readinto() writes no bytes,
     we raise ValueError about the blob being empty.
     """
     client = AzureBlobClient()
-    client.blob_service_client = MagicMock()
+    client.blob_service_client = Mock(spec=BlobServiceClient)
     client.container_name = "fake_container"
 
-    fake_container_client = MagicMock()
+    fake_container_client = Mock(spec=ContainerClient)
     client.blob_service_client.get_container_client.return_value = fake_container_client
-    fake_blob_client = MagicMock()
+    fake_blob_client = Mock(spec=BlobClient)
     fake_container_client.get_blob_client.return_value = fake_blob_client
 
-    fake_downloader = MagicMock()
-    fake_downloader.readall.return_value = b""
+    fake_downloader = Mock(spec=StorageStreamDownloader)
+    fake_downloader.readinto.return_value = 0
     fake_blob_client.download_blob.return_value = fake_downloader
 
     with pytest.raises(ValueError) as exc_info:
@@ -171,12 +283,12 @@ def test_get_pdf_stream_failure(mock_init, caplog):
     we log error and raise ValueError("Failed to retrieve blob '...'.")
     """
     client = AzureBlobClient()
-    client.blob_service_client = MagicMock()
+    client.blob_service_client = Mock(spec=BlobServiceClient)
     client.container_name = "fake_container"
 
-    fake_container_client = MagicMock()
+    fake_container_client = Mock(spec=ContainerClient)
     client.blob_service_client.get_container_client.return_value = fake_container_client
-    fake_blob_client = MagicMock()
+    fake_blob_client = Mock(spec=BlobClient)
     fake_container_client.get_blob_client.return_value = fake_blob_client
 
     fake_blob_client.download_blob.side_effect = Exception("Download error")
@@ -188,3 +300,25 @@ def test_get_pdf_stream_failure(mock_init, caplog):
 
     error_logs = [r.message for r in caplog.records if r.levelno == logging.ERROR]
     assert any("Error retrieving blob stream for bad_blob.pdf:" in msg for msg in error_logs)
+
+
+#
+# Tests for get_pdf_text
+#
+@patch("utils.azure_blob.extract_text_from_pdf_stream", return_value="Extracted text")
+@patch.object(AzureBlobClient, "get_pdf_stream")
+@patch.object(AzureBlobClient, "__init__", return_value=None)
+def test_get_pdf_text_passes_pages_and_closes_stream(mock_init, mock_get_stream, mock_extract):
+    """
+    get_pdf_text extracts only the requested pages and closes the downloaded stream.
+    """
+    client = AzureBlobClient()
+    fake_stream = Mock()
+    mock_get_stream.return_value = fake_stream
+
+    text = client.get_pdf_text("report.pdf", pages=range(10))
+
+    assert text == "Extracted text"
+    mock_get_stream.assert_called_once_with("report.pdf")
+    mock_extract.assert_called_once_with(fake_stream, page_numbers=range(10))
+    fake_stream.close.assert_called_once()
@@ -3,14 +3,32 @@ test_azure_search.py
 
 Pytest tests for azure_search.py, which contains:
 1) query_azure_search(query_embedding)
-2) call_azure_openai(client_query, top_chunks)
+2) query_azure_search_cached(query_embedding)
+3) call_azure_openai(client_query, top_chunks)
 """
 
+import asyncio
 import pytest
 import logging
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, Mock, AsyncMock
+from tenacity import wait_none
+import numpy as np
+import orjson
 import requests
-from utils.azure_search import query_azure_search, call_azure_openai
+from utils.azure_search import (
+    query_azure_search,
+    query_azure_search_cached,
+    call_azure_openai,
+    acall_azure_openai,
+    _SEARCH_CACHE,
+    _search_url,
+    _search_headers,
+    _get_llm,
+    _reciprocal_rank_fusion,
+    _post_search,
+    _fit_chunks_to_budget,
+    _SESSION,
+)
 
 @pytest.fixture
 def mock_config(monkeypatch):
@@ -27,56 +45,218 @@ def mock_config(monkeypatch):
     monkeypatch.setattr("utils.azure_search.config.AZURE_OPENAI_DEPLOYMENT_NAME", "fake_deployment")
 
 
+@pytest.fixture(autouse=True)
+def clear_search_cache():
+    """
+    Each test starts with an empty Azure Search result cache and
+    rebuilds the search URL/headers and LLM client from the (patched) config.
+    """
+    _SEARCH_CACHE.clear()
+    _search_url.cache_clear()
+    _search_headers.cache_clear()
+    _get_llm.cache_clear()
+    yield
+    _SEARCH_CACHE.clear()
+    _search_url.cache_clear()
+    _search_headers.cache_clear()
+    _get_llm.cache_clear()
+
+
 #
 # Tests for query_azure_search(query_embedding)
 #
-@patch("requests.post")
+@patch("utils.azure_search._SESSION.post")
 def test_query_azure_search_success(mock_post, mock_config):
     """
     If the request returns 200 and a valid JSON with 'value', we parse out the 'content'
     fields and return them.
     """
-    fake_response = MagicMock()
+    fake_response = Mock(spec=requests.Response)
     fake_response.status_code = 200
-    fake_response.json.return_value = {
+    fake_response.content = orjson.dumps({
         "value": [
             {"content": "Chunk 1 text", "metadata": {}},
             {"content": "Chunk 2 text", "metadata": {}}
         ]
-    }
+    })
     mock_post.return_value = fake_response
 
     embedding = [0.1, 0.2, 0.3]
     chunks = query_azure_search(embedding)
-    assert chunks == ["Chunk 1 text", "Chunk 2 text"]
+    assert chunks == ("Chunk 1 text", "Chunk 2 text")
     mock_post.assert_called_once()
 
+    url = mock_post.call_args.args[0]
+    assert url == "https://fake-search-endpoint/indexes/fake_index/docs/search?api-version=2023-07-01-Preview"
+    assert mock_post.call_args.kwargs["headers"]["api-key"] == "fake_admin_key"
+
+
+@patch("utils.azure_search._SESSION.post")
+def test_query_azure_search_parses_raw_body_without_vectors(mock_post, mock_config):
+    """
+    The response body is decoded from its raw bytes with orjson (never through
+    requests' response.json()), and the query only selects content/metadata so
+    the stored embedding vectors are not sent back with every hit.
+    """
+    fake_response = Mock(spec=requests.Response)
+    fake_response.status_code = 200
+    fake_response.content = orjson.dumps({"value": [{"content": "Chunk 1 text", "metadata": {}}]})
+    mock_post.return_value = fake_response
+
+    assert query_azure_search([0.1, 0.2]) == ("Chunk 1 text",)
+
+    fake_response.json.assert_not_called()
+    payload = orjson.loads(mock_post.call_args.kwargs["data"])
+    assert payload["select"] == "content,metadata"
+
+
+@patch("utils.azure_search._SESSION.post")
+def test_query_azure_search_skips_duplicate_chunks(mock_post, mock_config):
+    """
+    Hits with the same content (e.g. a PDF indexed twice) are returned only once.
+    """
+    fake_response = Mock(spec=requests.Response)
+    fake_response.status_code = 200
+    fake_response.content = orjson.dumps({
+        "value": [
+            {"content": "Repeated chunk", "metadata": {"filename": "a.pdf"}},
+            {"content": "Other chunk", "metadata": {}},
+            {"content": "Repeated chunk", "metadata": {"filename": "a-copy.pdf"}},
+        ]
+    })
+    mock_post.return_value = fake_response
+
+    assert query_azure_search([0.1, 0.2]) == ("Repeated chunk", "Other chunk")
 
-@patch("requests.post")
+
+@patch("utils.azure_search._SESSION.post")
+def test_query_azure_search_float32_embedding(mock_post, mock_config):
+    """
+    A float32 numpy embedding is sent as a plain JSON list of numbers.
+    """
+    fake_response = Mock(spec=requests.Response)
+    fake_response.status_code = 200
+    fake_response.content = orjson.dumps({"value": [{"content": "Chunk 1 text"}]})
+    mock_post.return_value = fake_response
+
+    chunks = query_azure_search(np.array([0.5, 0.25], dtype=np.float32))
+
+    assert chunks == ("Chunk 1 text",)
+    sent_vector = orjson.loads(mock_post.call_args.kwargs["data"])["vectors"][0]["value"]
+    assert sent_vector == [0.5, 0.25]
+
+
+@patch("utils.azure_search._SESSION.post")
+def test_query_azure_search_vector_round_trips_as_float32(mock_post, mock_config):
+    """
+    The shortest float32 repr sent on the wire parses back to the exact same vector.
+    """
+    fake_response = Mock(spec=requests.Response)
+    fake_response.status_code = 200
+    fake_response.content = orjson.dumps({"value": [{"content": "Chunk 1 text"}]})
+    mock_post.return_value = fake_response
+    embedding = np.random.default_rng(0).random(1536, dtype=np.float32)
+
+    query_azure_search(embedding[::-1])  # non-contiguous view
+
+    sent_vector = orjson.loads(mock_post.call_args.kwargs["data"])["vectors"][0]["value"]
+    assert np.array_equal(np.array(sent_vector, dtype=np.float32), embedding[::-1])
+
+
+@pytest.mark.parametrize("bad_embedding", [
+    [],
+    [[0.1, 0.2], [0.3, 0.4]],
+    [0.1, float("nan")],
+    [0.1, float("inf")],
+    [[0.1], [0.2, 0.3]],
+    "not a vector",
+])
+@patch("utils.azure_search._SESSION.post")
+def test_query_azure_search_rejects_invalid_embedding(mock_post, mock_config, bad_embedding):
+    """
+    Empty, non-1-D, non-finite or non-numeric embeddings are rejected
+    before any request is sent.
+    """
+    with pytest.raises(ValueError) as exc_info:
+        query_azure_search(bad_embedding)
+
+    assert "Query embedding is empty or invalid." in str(exc_info.value)
+    mock_post.assert_not_called()
+
+
+@patch("utils.azure_search._SESSION.post")
+def test_query_azure_search_checks_configured_dimensions(mock_post, mock_config, monkeypatch):
+    """
+    When EMBEDDING_DIMENSIONS is set, embeddings of any other length are rejected.
+    """
+    monkeypatch.setattr("utils.azure_search.config.EMBEDDING_DIMENSIONS", 3, raising=False)
+
+    with pytest.raises(ValueError) as exc_info:
+        query_azure_search([0.1, 0.2])
+
+    assert "Query embedding is empty or invalid." in str(exc_info.value)
+    mock_post.assert_not_called()
+
+
+@patch("utils.azure_search._SESSION.post")
+def test_query_azure_search_multiple_indexes(mock_post, mock_config):
+    """
+    With several indexes, each is queried and the rankings are merged by
+    reciprocal rank fusion (chunks found in both indexes rank first).
+    """
+    results_by_index = {
+        "shard_a": ["shared chunk", "only in a"],
+        "shard_b": ["only in b", "shared chunk"],
+    }
+
+    def fake_post(url, headers, data):
+        index_name = url.split("/indexes/")[1].split("/")[0]
+        response = Mock(spec=requests.Response)
+        response.status_code = 200
+        response.content = orjson.dumps({"value": [{"content": c} for c in results_by_index[index_name]]})
+        return response
+
+    mock_post.side_effect = fake_post
+
+    chunks = query_azure_search([0.1, 0.2], indexes=["shard_a", "shard_b"], k=2)
+
+    assert mock_post.call_count == 2
+    assert chunks == ("shared chunk", "only in b")
+
+
+def test_reciprocal_rank_fusion_orders_by_fused_score():
+    """
+    Higher-ranked and more frequently retrieved chunks come first; output is capped at k.
+    """
+    merged = _reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=3)
+    assert merged == ("b", "a", "d")
+
+
+@patch("utils.azure_search._SESSION.post")
 def test_query_azure_search_no_results(mock_post, mock_config, caplog):
     """
     If the request returns 200 but 'value' is empty or missing content,
     we return an empty list. Also logs a warning.
     """
-    fake_response = MagicMock()
+    fake_response = Mock(spec=requests.Response)
     fake_response.status_code = 200
-    fake_response.json.return_value = {"value": []}
+    fake_response.content = orjson.dumps({"value": []})
     mock_post.return_value = fake_response
 
     with caplog.at_level(logging.WARNING):
         embedding = [0.4, 0.5]
         chunks = query_azure_search(embedding)
 
-    assert chunks == [], "No chunks if the 'value' list is empty."
+    assert chunks == (), "No chunks if the 'value' list is empty."
     assert any("No results retrieved from Azure Search." in rec.message for rec in caplog.records)
 
 
-@patch("requests.post")
+@patch("utils.azure_search._SESSION.post")
 def test_query_azure_search_non_200(mock_post, mock_config):
     """
     If the request returns a non-200 status, we raise ValueError.
     """
-    fake_response = MagicMock()
+    fake_response = Mock(spec=requests.Response)
     fake_response.status_code = 500
     fake_response.text = "Server error"
     mock_post.return_value = fake_response
@@ -86,10 +266,62 @@ def test_query_azure_search_non_200(mock_post, mock_config):
     assert "Azure Search query failed with status code 500" in str(exc_info.value)
 
 
-@patch("requests.post", side_effect=requests.exceptions.RequestException("Network error"))
+@patch("utils.azure_search._SESSION.post")
+def test_query_azure_search_retries_throttling(mock_post, mock_config, monkeypatch):
+    """
+    A 429 (throttled) response is retried, and the following 200 succeeds.
+    """
+    monkeypatch.setattr(_post_search.retry, "wait", wait_none())
+
+    throttled = Mock(spec=requests.Response)
+    throttled.status_code = 429
+    ok = Mock(spec=requests.Response)
+    ok.status_code = 200
+    ok.content = orjson.dumps({"value": [{"content": "Chunk after retry"}]})
+    mock_post.side_effect = [throttled, ok]
+
+    chunks = query_azure_search([0.1, 0.2])
+
+    assert chunks == ("Chunk after retry",)
+    assert mock_post.call_count == 2
+
+
+@patch("utils.azure_search._SESSION.post")
+def test_query_azure_search_throttling_exhausted(mock_post, mock_config, monkeypatch):
+    """
+    If every attempt is throttled, ValueError is raised with the last status code.
+    """
+    monkeypatch.setattr(_post_search.retry, "wait", wait_none())
+
+    throttled = Mock(spec=requests.Response)
+    throttled.status_code = 429
+    throttled.text = "Too many requests"
+    mock_post.return_value = throttled
+
+    with pytest.raises(ValueError) as exc_info:
+        query_azure_search([0.1, 0.2])
+
+    assert "Azure Search query failed with status code 429" in str(exc_info.value)
+    assert mock_post.call_count == 4
+
+
+def test_session_retries_transient_gateway_errors_only():
+    """
+    The pooled session retries connection failures and 500/502/504 at the
+    transport level; 429/503 are left to _post_search's backoff.
+    """
+    max_retries = _SESSION.get_adapter("https://example.search.windows.net").max_retries
+    assert max_retries.total == 3
+    assert set(max_retries.status_forcelist) == {500, 502, 504}
+    assert max_retries.is_retry("POST", 502)
+    assert not max_retries.is_retry("POST", 429)
+    assert not max_retries.raise_on_status
+
+
+@patch("utils.azure_search._SESSION.post", side_effect=requests.exceptions.RequestException("Network error"))
 def test_query_azure_search_exception(mock_post, mock_config):
     """
-    If requests.post raises a RequestException or any other error,
+    If the session's post raises a RequestException or any other error,
     we catch it and raise ValueError("Failed to query Azure Search.")
     """
     with pytest.raises(ValueError) as exc_info:
@@ -97,10 +329,41 @@ def test_query_azure_search_exception(mock_post, mock_config):
     assert "Failed to query Azure Search." in str(exc_info.value)
 
 
+#
+# Tests for query_azure_search_cached(query_embedding)
+#
+@patch("utils.azure_search.query_azure_search")
+def test_query_azure_search_cached_hit(mock_query, mock_config):
+    """
+    Repeating the same embedding is served from the cache without a second search.
+    """
+    mock_query.return_value = ("Chunk 1 text",)
+
+    first = query_azure_search_cached([0.1, 0.2, 0.3])
+    second = query_azure_search_cached([0.1, 0.2, 0.3])
+
+    assert first == second == ("Chunk 1 text",)
+    mock_query.assert_called_once_with([0.1, 0.2, 0.3], ("fake_index",), 5)
+
+
+@patch("utils.azure_search.query_azure_search")
+def test_query_azure_search_cached_skips_empty_results(mock_query, mock_config):
+    """
+    Empty results are not cached, and different embeddings are looked up separately.
+    """
+    mock_query.return_value = ()
+
+    assert query_azure_search_cached([0.1, 0.2]) == ()
+    assert query_azure_search_cached([0.1, 0.2]) == ()
+    query_azure_search_cached([0.3, 0.4])
+
+    assert mock_query.call_count == 3
+
+
 #
 # Tests for call_azure_openai(client_query, top_chunks)
 #
-@patch("llama_index.llms.azure_openai.AzureOpenAI")
+@patch("utils.azure_search.AzureOpenAI")
 def test_call_azure_openai_success(mock_azure_openai, mock_config, caplog):
     """
     Mocks AzureOpenAI so we don't do a real call.
@@ -109,8 +372,8 @@ def test_call_azure_openai_success(mock_azure_openai, mock_config, caplog):
     from llama_index.llms.openai.utils import ChatMessage
 
     # Mock out the client.chat(...) method to return a mock ChatResponse
-    mock_client_instance = MagicMock()
-    mock_response = MagicMock()
+    mock_client_instance = Mock()
+    mock_response = Mock()
     mock_response.message.content = "Mocked AI answer."
     mock_client_instance.chat.return_value = mock_response
 
@@ -131,16 +394,94 @@ def test_call_azure_openai_success(mock_azure_openai, mock_config, caplog):
     # We'll just confirm it doesn't crash and returns the mocked content.
 
 
-@patch("llama_index.llms.azure_openai.AzureOpenAI")
+@patch("utils.azure_search.AzureOpenAI")
+def test_call_azure_openai_reuses_client(mock_azure_openai, mock_config):
+    """
+    The AzureOpenAI client is built once and reused by later calls.
+    """
+    mock_response = Mock()
+    mock_response.message.content = "Mocked AI answer."
+    mock_azure_openai.return_value.chat.return_value = mock_response
+
+    call_azure_openai("First query", ["chunkA"])
+    call_azure_openai("Second query", ["chunkB"])
+
+    mock_azure_openai.assert_called_once()
+    assert mock_azure_openai.return_value.chat.call_count == 2
+
+
+@patch("utils.azure_search.AzureOpenAI")
 def test_call_azure_openai_exception(mock_azure_openai, mock_config):
     """
     If the AzureOpenAI client raises an exception,
     we re-raise it as ValueError("Failed to call Azure OpenAI for final answer.").
     """
-    mock_client_instance = MagicMock()
+    mock_client_instance = Mock()
     mock_client_instance.chat.side_effect = Exception("Simulated error in chat()")
     mock_azure_openai.return_value = mock_client_instance
 
     with pytest.raises(ValueError) as exc_info:
         call_azure_openai("Some query", ["chunk1"])
     assert "Failed to call Azure OpenAI for final answer." in str(exc_info.value)
+
+
+@patch("utils.azure_search.AzureOpenAI")
+def test_acall_azure_openai_success(mock_azure_openai, mock_config):
+    """
+    acall_azure_openai awaits the client's achat(...) and returns the message content.
+    """
+    mock_client_instance = Mock()
+    mock_response = Mock()
+    mock_response.message.content = "Mocked async answer."
+    mock_client_instance.achat = AsyncMock(return_value=mock_response)
+    mock_azure_openai.return_value = mock_client_instance
+
+    final_answer = asyncio.run(acall_azure_openai("Some query", ["chunkA"]))
+
+    assert final_answer == "Mocked async answer."
+    mock_client_instance.achat.assert_awaited_once()
+    mock_client_instance.chat.assert_not_called()
+
+
+@patch("utils.azure_search.AzureOpenAI")
+def test_acall_azure_openai_exception(mock_azure_openai, mock_config):
+    """
+    Errors from achat(...) are re-raised as ValueError, as in call_azure_openai.
+    """
+    mock_client_instance = Mock()
+    mock_client_instance.achat = AsyncMock(side_effect=Exception("Simulated error in achat()"))
+    mock_azure_openai.return_value = mock_client_instance
+
+    with pytest.raises(ValueError) as exc_info:
+        asyncio.run(acall_azure_openai("Some query", ["chunk1"]))
+    assert "Failed to call Azure OpenAI for final answer." in str(exc_info.value)
+
+
+def test_fit_chunks_to_budget_keeps_highest_ranked():
+    """
+    Chunks are kept in rank order until the next one would exceed the token budget;
+    the top chunk is kept even when it alone is over budget.
+    """
+    short = "word " * 10
+    long = "word " * 100
+
+    assert _fit_chunks_to_budget([short, short, long, short], budget=50) == [short, short]
+    assert _fit_chunks_to_budget([long, short], budget=50) == [long]
+    assert _fit_chunks_to_budget([], budget=50) == []
+
+
+@patch("utils.azure_search.AzureOpenAI")
+def test_call_azure_openai_trims_context_to_budget(mock_azure_openai, mock_config, monkeypatch):
+    """
+    Only the chunks that fit config.CONTEXT_TOKEN_BUDGET are sent as context.
+    """
+    monkeypatch.setattr("utils.azure_search.config.CONTEXT_TOKEN_BUDGET", 20, raising=False)
+    mock_response = Mock()
+    mock_response.message.content = "Mocked AI answer."
+    mock_azure_openai.return_value.chat.return_value = mock_response
+
+    call_azure_openai("Query", ["first " * 10, "second " * 10])
+
+    messages = mock_azure_openai.return_value.chat.call_args.kwargs["messages"]
+    assert "first" in messages[1].content
+    assert "second" not in messages[1].content
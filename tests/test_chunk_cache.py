@@ -0,0 +1,77 @@
+"""
+test_chunk_cache.py
+
+Pytest tests for chunk_cache.py, the persistent SQLite cache of chunked and
+embedded document text used by PDFChunker.
+"""
+
+import sqlite3
+import pytest
+import numpy as np
+from utils.chunk_cache import ChunkCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ChunkCache(str(tmp_path / "chunks.sqlite"))
+
+
+def test_put_and_get_round_trip(cache):
+    """
+    Stored chunks come back in order, with float32-packed embeddings.
+    """
+    key = ChunkCache.key("Some document text", "embedding-model")
+    cache.put(key, [("Chunk A", [0.5, 0.25]), ("Chunk B", np.array([1.0, -2.0]))])
+
+    assert cache.get(key) == [("Chunk A", [0.5, 0.25]), ("Chunk B", [1.0, -2.0])]
+
+
+def test_missing_key_returns_none(cache):
+    assert cache.get(ChunkCache.key("Never stored")) is None
+
+
+def test_put_replaces_previous_entry(cache):
+    """
+    Re-storing a key replaces all of its chunks rather than appending.
+    """
+    key = ChunkCache.key("Doc")
+    cache.put(key, [("Old 1", [0.1]), ("Old 2", [0.2])])
+    cache.put(key, [("New", [0.3])])
+
+    assert cache.get(key) == [("New", pytest.approx([0.3]))]
+
+
+def test_key_depends_on_text_and_model():
+    assert ChunkCache.key("Doc", "model-a") == ChunkCache.key("Doc", "model-a")
+    assert ChunkCache.key("Doc", "model-a") != ChunkCache.key("Doc", "model-b")
+    assert ChunkCache.key("Doc", "model-a") != ChunkCache.key("Doc 2", "model-a")
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "chunks.sqlite")
+    key = ChunkCache.key("Doc")
+    ChunkCache(path).put(key, [("Chunk", [0.5])])
+
+    assert ChunkCache(path).get(key) == [("Chunk", [0.5])]
+
+
+def test_read_errors_are_treated_as_misses(cache):
+    """
+    A broken database is logged and treated as a cache miss, not raised.
+    """
+    with sqlite3.connect(cache.path) as conn:
+        conn.execute("DROP TABLE chunks")
+
+    assert cache.get(ChunkCache.key("Doc")) is None
+    cache.put(ChunkCache.key("Doc"), [("Chunk", [0.5])])  # does not raise
+
+
+def test_unopenable_database_disables_cache(tmp_path):
+    """
+    A database path that cannot be opened disables the cache instead of raising.
+    """
+    cache = ChunkCache(str(tmp_path / "missing_dir" / "chunks.sqlite"))
+
+    assert cache.enabled is False
+    cache.put(ChunkCache.key("Doc"), [("Chunk", [0.5])])  # does not raise
+    assert cache.get(ChunkCache.key("Doc")) is None
@@ -2,14 +2,16 @@
 test_config.py
 
 Pytest tests for config.py to ensure all required variables
-cause an EnvironmentError if missing. Mocks load_dotenv() so
-that local .env files do not interfere.
+cause an EnvironmentError if missing when they are accessed. Mocks load_dotenv() so
+that local .env files do not interfere. Also covers scripts/bake_config.py,
+which produces the frozen config module.
 """
 
 import os
 import sys
 import pytest
 import logging
+import types
 import importlib
 from unittest.mock import patch
 
@@ -27,11 +29,14 @@ REQUIRED_ENV_VARS = [
 ]
 
 @pytest.fixture
-def clear_config_module():
+def clear_config_module(tmp_path, monkeypatch):
     """
     Remove 'config' from sys.modules so we can re-import it
     and trigger the environment variable checks each time.
+    Runs from an empty directory so no local .env or config cache is picked up.
     """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(sys.modules, "config_frozen", None)  # ignore any baked config
     if "config" in sys.modules:
         del sys.modules["config"]
     yield
@@ -63,6 +68,8 @@ def test_all_vars_present(mock_load, caplog):
         with caplog.at_level(logging.CRITICAL):
             import config
             importlib.reload(config)  # re-run top-level logic
+            for var in REQUIRED_ENV_VARS:
+                assert getattr(config, var) == full_env[var]
 
         # Confirm no CRITICAL logs
         crit_logs = [r for r in caplog.records if r.levelno == logging.CRITICAL]
@@ -75,7 +82,7 @@ def test_all_vars_present(mock_load, caplog):
 def test_missing_var_raises_env_error(mock_load, missing_var, caplog):
     """
     For each required var, remove it from the environment
-    and confirm config.py raises EnvironmentError + logs CRITICAL.
+    and confirm accessing it on config raises EnvironmentError + logs CRITICAL.
     """
     # Provide everything except the missing var
     test_env = {}
@@ -85,9 +92,10 @@ def test_missing_var_raises_env_error(mock_load, missing_var, caplog):
 
     with patch.dict(os.environ, test_env, clear=True):
         with caplog.at_level(logging.CRITICAL):
+            import config
+            importlib.reload(config)  # import itself no longer resolves the vars
             with pytest.raises(EnvironmentError) as exc_info:
-                import config
-                importlib.reload(config)
+                getattr(config, missing_var)
 
         crit_logs = [r.message for r in caplog.records if r.levelno == logging.CRITICAL]
         assert crit_logs, f"Missing {missing_var} should produce CRITICAL log."
@@ -98,3 +106,143 @@ def test_missing_var_raises_env_error(mock_load, missing_var, caplog):
         assert missing_var in combined_crit or missing_var in exc_str, (
             f"Missing var '{missing_var}' not in logs or exception text."
         )
+
+
+@pytest.mark.usefixtures("clear_config_module")
+@patch("dotenv.load_dotenv", return_value=None)
+def test_env_cache_skips_dotenv_parsing(mock_load, tmp_path):
+    """
+    The first load parses .env and writes _config_cache.py beside it; later
+    loads with an unchanged .env read the cache instead of re-parsing.
+    """
+    full_env = {var: f"some_value_for_{var}" for var in REQUIRED_ENV_VARS}
+    (tmp_path / ".env").write_text("CACHED_TEST_VAR=from_dotenv\n")
+    repo_cache = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "_config_cache.py")
+    repo_cache_before = os.path.exists(repo_cache) and os.stat(repo_cache).st_mtime_ns
+
+    with patch.dict(os.environ, full_env, clear=True):
+        import config
+        assert os.environ["CACHED_TEST_VAR"] == "from_dotenv"
+        assert (tmp_path / "_config_cache.py").exists()
+
+    with patch.dict(os.environ, full_env, clear=True):
+        with patch("config.dotenv_values") as mock_values:
+            config._load_env()
+        mock_values.assert_not_called()
+        assert os.environ["CACHED_TEST_VAR"] == "from_dotenv"
+
+    # The import must not touch a cache outside the .env's directory.
+    assert (os.path.exists(repo_cache) and os.stat(repo_cache).st_mtime_ns) == repo_cache_before
+
+
+@pytest.mark.usefixtures("clear_config_module")
+@patch("dotenv.load_dotenv", return_value=None)
+def test_unknown_attribute_raises_attribute_error(mock_load):
+    """
+    Names that are not config constants still raise AttributeError.
+    """
+    with patch.dict(os.environ, {}, clear=True):
+        import config
+        with pytest.raises(AttributeError):
+            config.NOT_A_CONFIG_VALUE
+
+
+@pytest.mark.usefixtures("clear_config_module")
+@patch("dotenv.load_dotenv")
+def test_frozen_config_skips_dotenv(mock_load, monkeypatch):
+    """
+    If config_frozen is importable, its constants are used and .env is not loaded.
+    """
+    frozen = types.ModuleType("config_frozen")
+    frozen.SEARCH_INDEX_NAME = "frozen_index"
+    monkeypatch.setitem(sys.modules, "config_frozen", frozen)
+
+    with patch.dict(os.environ, {}, clear=True):
+        import config
+
+    assert config.SEARCH_INDEX_NAME == "frozen_index"
+    mock_load.assert_not_called()
+
+
+@pytest.mark.usefixtures("clear_config_module")
+@patch("dotenv.load_dotenv", return_value=None)
+def test_bake_config_writes_frozen_module(mock_load, tmp_path):
+    """
+    bake() writes every required variable as a literal (environment first,
+    then .env) and byte-compiles the module.
+    """
+    env_file = tmp_path / ".env"
+    env_file.write_text("SEARCH_INDEX_NAME=from_dotenv\n")
+    env = {var: f"some_value_for_{var}" for var in REQUIRED_ENV_VARS if var != "SEARCH_INDEX_NAME"}
+    out_path = tmp_path / "config_frozen.py"
+
+    with patch.dict(os.environ, env, clear=True):
+        from scripts.bake_config import bake
+        pyc_path = bake(str(env_file), str(out_path))
+
+    namespace = {}
+    exec(out_path.read_text(), namespace)
+    assert namespace["SEARCH_INDEX_NAME"] == "from_dotenv"
+    assert namespace["SEARCH_ADMIN_KEY"] == "some_value_for_SEARCH_ADMIN_KEY"
+    assert sorted(namespace["__all__"]) == sorted(REQUIRED_ENV_VARS)
+    assert os.path.exists(pyc_path)
+
+
+@pytest.mark.usefixtures("clear_config_module")
+@patch("dotenv.load_dotenv", return_value=None)
+def test_bake_config_missing_var_raises(mock_load, tmp_path):
+    """
+    bake() refuses to write a frozen config with a required variable missing.
+    """
+    with patch.dict(os.environ, {}, clear=True):
+        from scripts.bake_config import bake
+        with pytest.raises(EnvironmentError):
+            bake(str(tmp_path / ".env"), str(tmp_path / "config_frozen.py"))
+
+    assert not (tmp_path / "config_frozen.py").exists()
+
+
+@pytest.mark.usefixtures("clear_config_module")
+def test_bake_config_ignores_working_directory_env(tmp_path, monkeypatch):
+    """
+    Baking another env file (e.g. prod.env) takes its values, not the working
+    directory's .env: only variables already in the environment override it.
+    """
+    monkeypatch.delitem(sys.modules, "scripts.bake_config", raising=False)
+    (tmp_path / ".env").write_text("".join(f"{var}=dev\n" for var in REQUIRED_ENV_VARS))
+    prod_env = tmp_path / "prod.env"
+    prod_env.write_text("".join(f"{var}=prod\n" for var in REQUIRED_ENV_VARS))
+    out_path = tmp_path / "config_frozen.py"
+
+    with patch.dict(os.environ, {"SEARCH_ADMIN_KEY": "from_environment"}, clear=True):
+        from scripts.bake_config import bake
+        bake(str(prod_env), str(out_path))
+
+    namespace = {}
+    exec(out_path.read_text(), namespace)
+    assert namespace["SEARCH_INDEX_NAME"] == "prod"
+    assert namespace["SEARCH_ADMIN_KEY"] == "from_environment"
+    assert "config" not in sys.modules
+
+
+@pytest.mark.usefixtures("clear_config_module")
+@patch("dotenv.load_dotenv", return_value=None)
+def test_optional_var_default_and_override(mock_load):
+    """
+    Optional variables fall back to their default, are converted to the
+    default's type when set, and raise EnvironmentError on invalid values.
+    """
+    with patch.dict(os.environ, {}, clear=True):
+        import config
+        assert config.EMBED_MAX_CONCURRENCY == 5
+
+    del sys.modules["config"]
+    with patch.dict(os.environ, {"EMBED_MAX_CONCURRENCY": "3"}, clear=True):
+        import config
+        assert config.EMBED_MAX_CONCURRENCY == 3
+
+    del sys.modules["config"]
+    with patch.dict(os.environ, {"EMBED_MAX_CONCURRENCY": "lots"}, clear=True):
+        import config
+        with pytest.raises(EnvironmentError):
+            config.EMBED_MAX_CONCURRENCY
@@ -8,7 +8,7 @@ we can test the logic without requiring user interaction or real Azure calls.
 
 import pytest
 import logging
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, Mock, MagicMock
 import main
 
 @pytest.fixture
@@ -20,13 +20,13 @@ def mock_streamlit(monkeypatch):
     mocks = {}
 
     # Mock the streamlit functions we use in main.py
-    mocks['set_page_config'] = MagicMock()
-    mocks['title'] = MagicMock()
-    mocks['text_input'] = MagicMock(return_value="")  # default: user enters nothing
-    mocks['markdown'] = MagicMock()
-    mocks['write'] = MagicMock()
-    mocks['expander'] = MagicMock()
-    mocks['error'] = MagicMock()
+    mocks['set_page_config'] = Mock()
+    mocks['title'] = Mock()
+    mocks['text_input'] = Mock(return_value="")  # default: user enters nothing
+    mocks['markdown'] = Mock()
+    mocks['write'] = Mock()
+    mocks['expander'] = MagicMock()  # used as a context manager
+    mocks['error'] = Mock()
 
     monkeypatch.setattr(main.st, "set_page_config", mocks['set_page_config'])
     monkeypatch.setattr(main.st, "title", mocks['title'])
@@ -42,13 +42,25 @@ def mock_streamlit(monkeypatch):
 def mock_rag_pipeline(monkeypatch):
     """
     A fixture to mock the rag_pipeline function so we don't hit real Azure resources.
-    Returns a MagicMock that we can configure in tests.
+    Returns a Mock that we can configure in tests.
     """
-    pipeline_mock = MagicMock(return_value=("Sample final answer", ["chunk1", "chunk2"]))
+    pipeline_mock = Mock(return_value=("Sample final answer", ("chunk1", "chunk2")))
     monkeypatch.setattr("main.rag_pipeline", pipeline_mock)
-    return pipeline_mock
+    main._cached_rag.clear()  # don't serve answers cached by other tests
+    yield pipeline_mock
+    main._cached_rag.clear()
 
-def test_main_no_input(mock_streamlit, mock_rag_pipeline):
+@pytest.fixture
+def mock_get_chunker(monkeypatch):
+    """
+    A fixture to mock the cached chunker factory so no real PDFChunker is built.
+    Returns the Mock factory; its return_value is the shared chunker.
+    """
+    factory_mock = Mock(return_value=Mock())
+    monkeypatch.setattr("main.get_shared_chunker", factory_mock)
+    return factory_mock
+
+def test_main_no_input(mock_streamlit, mock_rag_pipeline, mock_get_chunker):
     """
     If user_question is empty, rag_pipeline should NOT be called
     and no final answer is displayed.
@@ -63,18 +75,20 @@ def test_main_no_input(mock_streamlit, mock_rag_pipeline):
     mock_streamlit['markdown'].assert_not_called()
     mock_streamlit['write'].assert_not_called()
 
-def test_main_with_input(mock_streamlit, mock_rag_pipeline):
+def test_main_with_input(mock_streamlit, mock_rag_pipeline, mock_get_chunker):
     """
     If user_question is non-empty, rag_pipeline is called, and we display the final answer + chunks.
     """
     mock_streamlit['text_input'].return_value = "What is the capital of France?"
     # Provide a custom pipeline return
-    mock_rag_pipeline.return_value = ("Paris is the capital of France", ["chunkA", "chunkB"])
+    mock_rag_pipeline.return_value = ("Paris is the capital of France", ("chunkA", "chunkB"))
 
     main.main()
 
-    # rag_pipeline should be called once with the user input
-    mock_rag_pipeline.assert_called_once_with("What is the capital of France?")
+    # rag_pipeline should be called once with the user input and the cached chunker
+    mock_rag_pipeline.assert_called_once_with(
+        "What is the capital of France?", chunker=mock_get_chunker.return_value
+    )
 
     # We should see "Answer:", then the final answer, and an expander for chunks
     mock_streamlit['markdown'].assert_any_call("**Answer:**")
@@ -83,7 +97,7 @@ def test_main_with_input(mock_streamlit, mock_rag_pipeline):
     # The expander was created
     mock_streamlit['expander'].assert_called_once_with("Relevant Chunks from the PDF")
 
-def test_main_with_exception(mock_streamlit, mock_rag_pipeline, caplog):
+def test_main_with_exception(mock_streamlit, mock_rag_pipeline, mock_get_chunker, caplog):
     """
     If rag_pipeline raises an exception, the app should log the exception
     and display st.error.
@@ -105,3 +119,52 @@ def test_main_with_exception(mock_streamlit, mock_rag_pipeline, caplog):
     mock_streamlit['error'].assert_called_once()
     args, kwargs = mock_streamlit['error'].call_args
     assert "Simulated pipeline failure" in args[0]
+
+def test_main_sets_openai_credentials_once(mock_streamlit, mock_rag_pipeline, mock_get_chunker, monkeypatch):
+    """
+    Azure OpenAI credentials are set on the first run only, not on every rerun.
+    """
+    fake_openai = Mock()
+    monkeypatch.setattr(main, "openai", fake_openai)
+    monkeypatch.setattr("main.config.AZURE_OPENAI_API_KEY", "fake_key")
+    main._init_openai.clear()
+
+    main.main()
+    assert fake_openai.api_type == "azure"
+    assert fake_openai.api_key == "fake_key"
+
+    fake_openai.api_key = "untouched"
+    main.main()
+    assert fake_openai.api_key == "untouched"
+
+    main._init_openai.clear()
+
+
+def test_main_caches_repeated_question(mock_streamlit, mock_rag_pipeline, mock_get_chunker):
+    """
+    Asking the same question again is answered from the cache without rerunning the pipeline.
+    """
+    mock_streamlit['text_input'].return_value = "Same question"
+
+    main.main()
+    main.main()
+
+    mock_rag_pipeline.assert_called_once_with("Same question", chunker=mock_get_chunker.return_value)
+    assert mock_streamlit['write'].call_count == 2
+
+
+@pytest.mark.parametrize("fallback", [
+    (main.NO_CHUNKS_ANSWER, ()),
+    (main.NO_RESPONSE_ANSWER, ("chunk1",)),
+])
+def test_main_does_not_cache_fallback_answers(mock_streamlit, mock_rag_pipeline, mock_get_chunker, fallback):
+    """
+    Fallback answers are not cached, so asking again reruns the pipeline
+    (e.g. to find documents indexed in the meantime).
+    """
+    mock_rag_pipeline.return_value = fallback
+
+    assert main.cached_rag("No-result question", "index") == fallback
+    assert main.cached_rag("No-result question", "index") == fallback
+
+    assert mock_rag_pipeline.call_count == 2
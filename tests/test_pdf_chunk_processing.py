@@ -7,32 +7,45 @@ Pytest tests for pdf_chunk_processing.py, which provides:
    and LlamaIndex's SemanticSplitterNodeParser.
 """
 
+import os
+import sys
+import types
 import pytest
 import logging
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, Mock
 from io import BytesIO
-from PyPDF2 import PdfWriter
+import pymupdf
+from llama_index.core.node_parser import SentenceSplitter
+import config
 
-from utils.pdf_chunk_processing import extract_text_from_pdf_stream, PDFChunker
+from utils import pdf_chunk_processing
+from utils.pdf_chunk_processing import extract_text_from_pdf_stream, PDFChunker, _EMBED_BATCH_SIZE
+
+
+@pytest.fixture(autouse=True)
+def pin_chunker_config(monkeypatch):
+    """
+    Pins the optional chunker settings, so a developer's environment or .env
+    (e.g. CHUNK_CACHE_PATH from the README) can't leak into the tests.
+    """
+    monkeypatch.setattr(config, "CHUNK_CACHE_PATH", "", raising=False)
+    monkeypatch.setattr(config, "CHUNK_STRATEGY", "semantic", raising=False)
+    monkeypatch.setattr(config, "SPLITTER_EMBED_MODEL", "", raising=False)
 
 
 @pytest.fixture
 def sample_pdf_with_text() -> bytes:
     """
-    Generate an in-memory PDF containing a single page.
-    We also set some metadata 'Title=Hello World'.
-
-    Note: PyPDF2 won't parse 'Hello World' as text from metadata,
-    so the actual extracted text is likely empty. We mainly confirm
-    that the PDF is valid (no corruption error).
+    Generate an in-memory PDF containing a single page with
+    the text 'Hello World', plus some metadata 'Title=Hello World'.
     """
-    buffer = BytesIO()
-    writer = PdfWriter()
-    writer.add_blank_page(width=300, height=300)
-    writer.add_metadata({"/Title": "Hello World"})
-    writer.write(buffer)
-    buffer.seek(0)
-    return buffer.read()
+    doc = pymupdf.open()
+    page = doc.new_page(width=300, height=300)
+    page.insert_text((50, 50), "Hello World")
+    doc.set_metadata({"title": "Hello World"})
+    data = doc.tobytes()
+    doc.close()
+    return data
 
 
 @pytest.fixture
@@ -41,36 +54,21 @@ def sample_pdf_no_text() -> bytes:
     Generate an in-memory PDF with a single blank page and no metadata.
     Should also yield no text for extraction.
     """
-    buffer = BytesIO()
-    writer = PdfWriter()
-    writer.add_blank_page(width=300, height=300)
-    writer.write(buffer)
-    buffer.seek(0)
-    return buffer.read()
+    doc = pymupdf.open()
+    doc.new_page(width=300, height=300)
+    data = doc.tobytes()
+    doc.close()
+    return data
 
 
-def test_extract_text_success(sample_pdf_with_text, caplog):
+def test_extract_text_success(sample_pdf_with_text):
     """
-    Test extract_text_from_pdf_stream() with a valid minimal PDF.
-    Because there's no real embedded text objects, page.extract_text()
-    will likely return empty. If it's empty, your code should raise
-    ValueError("The PDF appears to have no extractable text.").
-    We'll confirm that behavior or see if partial text is found.
+    Test extract_text_from_pdf_stream() with a valid one-page PDF
+    that contains a real text object.
     """
     pdf_stream = BytesIO(sample_pdf_with_text)
-    with caplog.at_level(logging.WARNING):
-        try:
-            extracted_text = extract_text_from_pdf_stream(pdf_stream)
-        except ValueError as e:
-            # If it's empty, we expect a ValueError about no text.
-            assert "no extractable text" in str(e).lower()
-            return
-
-    # If we reach here, no exception was raised, meaning the code
-    # found some text. Let's confirm it's not empty:
-    assert extracted_text.strip(), (
-        "Expected some text or a ValueError if none is found."
-    )
+    extracted_text = extract_text_from_pdf_stream(pdf_stream)
+    assert "Hello World" in extracted_text
 
 def test_extract_text_no_text(sample_pdf_no_text):
     """
@@ -83,6 +81,106 @@ def test_extract_text_no_text(sample_pdf_no_text):
     assert "the pdf appears to have no extractable text" in str(exc_info.value).lower()
 
 
+def test_extract_text_opens_file_backed_stream_by_path(sample_pdf_with_text, tmp_path):
+    """
+    A stream backed by a file on disk is opened by path, not read into memory.
+    """
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(sample_pdf_with_text)
+    pdf_stream = Mock()
+    pdf_stream.name = str(pdf_path)
+    pdf_stream.read.side_effect = AssertionError("the PDF should not be read into memory")
+
+    assert "Hello World" in extract_text_from_pdf_stream(pdf_stream)
+
+
+def test_extract_text_parallel_pages_keep_order(monkeypatch):
+    """
+    Above _PARALLEL_PAGE_THRESHOLD pages, extraction is split across worker
+    processes; the page texts are still joined in document order.
+    """
+    monkeypatch.setattr("utils.pdf_chunk_processing._PARALLEL_PAGE_THRESHOLD", 2)
+    monkeypatch.setattr("utils.pdf_chunk_processing.os.cpu_count", lambda: 2)
+    doc = pymupdf.open()
+    for i in range(5):
+        doc.new_page(width=300, height=300).insert_text((50, 50), f"Page {i}")
+    pdf_stream = BytesIO(doc.tobytes())
+    doc.close()
+
+    extracted_text = extract_text_from_pdf_stream(pdf_stream)
+    positions = [extracted_text.index(f"Page {i}") for i in range(5)]
+    assert positions == sorted(positions)
+
+
+def test_extract_text_parallel_workers_share_pool_and_read_from_disk(monkeypatch):
+    """
+    Parallel extraction reuses one spawn-based worker pool across PDFs, and
+    workers are handed a file path rather than a copy of the PDF bytes.
+    """
+    monkeypatch.setattr("utils.pdf_chunk_processing._PARALLEL_PAGE_THRESHOLD", 2)
+    monkeypatch.setattr("utils.pdf_chunk_processing.os.cpu_count", lambda: 2)
+    doc = pymupdf.open()
+    for i in range(5):
+        doc.new_page(width=300, height=300).insert_text((50, 50), f"Page {i}")
+    pdf_bytes = doc.tobytes()
+    doc.close()
+
+    pool = pdf_chunk_processing._get_extract_pool()
+    assert pool._mp_context.get_start_method() == "spawn"
+    real_map = pool.map
+    worker_args = []
+
+    def spy_map(fn, paths, slices):
+        paths = list(paths)
+        worker_args.extend(paths)
+        return real_map(fn, paths, slices)
+
+    monkeypatch.setattr(pool, "map", spy_map)
+    for _ in range(2):
+        assert "Page 4" in extract_text_from_pdf_stream(BytesIO(pdf_bytes))
+
+    assert pdf_chunk_processing._get_extract_pool() is pool
+    assert worker_args and all(isinstance(arg, str) for arg in worker_args)
+    assert not any(os.path.exists(arg) for arg in worker_args)  # temp copies removed
+
+
+def test_extract_text_selected_pages(monkeypatch):
+    """
+    With page_numbers, only those pages are extracted, in the given order,
+    whether serially or in worker processes.
+    """
+    doc = pymupdf.open()
+    for i in range(5):
+        doc.new_page(width=300, height=300).insert_text((50, 50), f"Page {i}")
+    pdf_bytes = doc.tobytes()
+    doc.close()
+
+    extracted_text = extract_text_from_pdf_stream(BytesIO(pdf_bytes), page_numbers=[3, 1])
+    assert "Page 3" in extracted_text and "Page 1" in extracted_text
+    assert extracted_text.index("Page 3") < extracted_text.index("Page 1")
+    assert "Page 0" not in extracted_text and "Page 4" not in extracted_text
+
+    monkeypatch.setattr("utils.pdf_chunk_processing._PARALLEL_PAGE_THRESHOLD", 1)
+    monkeypatch.setattr("utils.pdf_chunk_processing.os.cpu_count", lambda: 2)
+    extracted_text = extract_text_from_pdf_stream(BytesIO(pdf_bytes), page_numbers=range(2, 5))
+    assert "Page 1" not in extracted_text
+    positions = [extracted_text.index(f"Page {i}") for i in range(2, 5)]
+    assert positions == sorted(positions)
+
+
+def test_extract_text_page_out_of_range(sample_pdf_with_text):
+    """
+    Pages past the end of the PDF are skipped, so range(10) works for a
+    one-page PDF; a negative page number raises ValueError.
+    """
+    extracted_text = extract_text_from_pdf_stream(BytesIO(sample_pdf_with_text), page_numbers=range(10))
+    assert "Hello World" in extracted_text
+
+    with pytest.raises(ValueError) as exc_info:
+        extract_text_from_pdf_stream(BytesIO(sample_pdf_with_text), page_numbers=[-1])
+    assert "out of range" in str(exc_info.value)
+
+
 def test_extract_text_corrupted_pdf():
     """
     If the PDF is truly corrupted, your code raises
@@ -95,23 +193,26 @@ def test_extract_text_corrupted_pdf():
 
 
 @patch("llama_index.embeddings.azure_openai.AzureOpenAIEmbedding.__init__", return_value=None)
-@patch("llama_index.embeddings.azure_openai.AzureOpenAIEmbedding.get_text_embedding", return_value=[0.1, 0.2, 0.3])
+@patch(
+    "llama_index.embeddings.azure_openai.AzureOpenAIEmbedding.get_text_embedding_batch",
+    side_effect=lambda texts, **kwargs: [[0.1, 0.2, 0.3] for _ in texts],
+)
 @patch("llama_index.core.node_parser.SemanticSplitterNodeParser.from_defaults")
 def test_pdfchunker_init_and_chunk_text(mock_splitter_init, mock_embed, mock_embed_init, caplog):
     """
     Test PDFChunker initialization + chunk_text success scenario.
     We patch:
       - The AzureOpenAIEmbedding.__init__ so we skip real network calls
-      - The embedding's get_text_embedding to return dummy vectors
+      - The embedding's get_text_embedding_batch to return dummy vectors
       - The semantic splitter so we control how many nodes are returned
     """
     # Mock: The semantic splitter returns 2 fake nodes with content
-    fake_node1 = MagicMock()
+    fake_node1 = Mock()
     fake_node1.get_content.return_value = "Chunk A"
-    fake_node2 = MagicMock()
+    fake_node2 = Mock()
     fake_node2.get_content.return_value = "Chunk B"
 
-    mock_splitter_instance = MagicMock()
+    mock_splitter_instance = Mock()
     mock_splitter_instance.get_nodes_from_documents.return_value = [fake_node1, fake_node2]
     mock_splitter_init.return_value = mock_splitter_instance
 
@@ -125,8 +226,9 @@ def test_pdfchunker_init_and_chunk_text(mock_splitter_init, mock_embed, mock_emb
 
     # The splitter was called once
     mock_splitter_instance.get_nodes_from_documents.assert_called_once()
-    # The embed model was called for each node
-    assert mock_embed.call_count == 2, "Should embed each chunk"
+    # Both chunks were embedded in a single batched request
+    mock_embed.assert_called_once()
+    assert mock_embed.call_args[0][0] == ["Chunk A", "Chunk B"]
 
     assert len(chunks) == 2, "Expected 2 chunked nodes"
     for node in chunks:
@@ -147,8 +249,8 @@ def test_pdfchunker_empty_text():
     chunker = PDFChunker()
     # We rely on environment variables or mocking for embed_model init if needed.
 
-    with patch.object(chunker, "splitter", MagicMock()) as mock_splitter, \
-         patch.object(chunker, "embed_model", MagicMock()) as mock_embed, \
+    with patch.object(chunker, "splitter", Mock()) as mock_splitter, \
+         patch.object(chunker, "embed_model", Mock()) as mock_embed, \
          patch("logging.Logger.warning") as warn_log:
 
         chunks = chunker.chunk_text("   ", filename="blank.pdf")
@@ -161,3 +263,176 @@ def test_pdfchunker_empty_text():
 
         mock_splitter.get_nodes_from_documents.assert_not_called()
         mock_embed.get_text_embedding.assert_not_called()
+        mock_embed.get_text_embedding_batch.assert_not_called()
+
+
+def test_pdfchunker_batches_and_falls_back_per_chunk():
+    """
+    Chunks are embedded in shards of _EMBED_BATCH_SIZE. If a shard's batched
+    request fails, its chunks are retried one by one and only the chunks that
+    still fail are dropped.
+    """
+    chunker = PDFChunker()
+    nodes = []
+    for i in range(_EMBED_BATCH_SIZE + 2):
+        node = Mock()
+        node.get_content.return_value = f"Chunk {i}"
+        nodes.append(node)
+
+    def embed_batch(texts, **kwargs):
+        if "Chunk 0" in texts:
+            raise RuntimeError("batch rejected")
+        return [[0.5] for _ in texts]
+
+    def embed_one(text):
+        if text == "Chunk 1":
+            raise RuntimeError("bad chunk")
+        return [0.9]
+
+    with patch.object(chunker, "splitter", Mock()) as mock_splitter, \
+         patch.object(chunker, "embed_model", Mock()) as mock_embed:
+        mock_splitter.get_nodes_from_documents.return_value = nodes
+        mock_embed.get_text_embedding_batch.side_effect = embed_batch
+        mock_embed.get_text_embedding.side_effect = embed_one
+
+        chunks = chunker.chunk_text("Some text", filename="shards.pdf")
+
+    assert mock_embed.get_text_embedding_batch.call_count == 2
+    assert mock_embed.get_text_embedding.call_count == _EMBED_BATCH_SIZE
+    assert len(chunks) == _EMBED_BATCH_SIZE + 1
+    assert nodes[1] not in chunks
+    assert nodes[0].embedding == [0.9]
+    assert nodes[-1].embedding == [0.5]
+
+
+def test_pdfchunker_concurrent_shards_keep_order(monkeypatch):
+    """
+    Shards are embedded concurrently (bounded by EMBED_MAX_CONCURRENCY),
+    but each node still receives the embedding of its own text.
+    """
+    monkeypatch.setattr(config, "EMBED_MAX_CONCURRENCY", 3, raising=False)
+    monkeypatch.setattr("utils.pdf_chunk_processing._EMBED_SUBMIT_JITTER_S", 0)
+    chunker = PDFChunker()
+    nodes = []
+    for i in range(_EMBED_BATCH_SIZE * 4 + 1):
+        node = Mock()
+        node.get_content.return_value = str(i)
+        nodes.append(node)
+
+    with patch.object(chunker, "splitter", Mock()) as mock_splitter, \
+         patch.object(chunker, "embed_model", Mock()) as mock_embed:
+        mock_splitter.get_nodes_from_documents.return_value = nodes
+        mock_embed.get_text_embedding_batch.side_effect = lambda texts, **kwargs: [[float(t)] for t in texts]
+
+        chunks = chunker.chunk_text("Some text", filename="many.pdf")
+
+    assert mock_embed.get_text_embedding_batch.call_count == 5
+    assert len(chunks) == len(nodes)
+    for i, node in enumerate(nodes):
+        assert node.embedding == [float(i)]
+
+
+def test_pdfchunker_chunk_cache_skips_splitting_unchanged_text(tmp_path):
+    """
+    With a chunk cache, chunking the same text again returns the cached chunks
+    without calling the splitter or the embedding model.
+    """
+    chunker = PDFChunker(cache_path=str(tmp_path / "chunks.sqlite"))
+    node = Mock()
+    node.get_content.return_value = "Chunk A"
+
+    with patch.object(chunker, "splitter", Mock()) as mock_splitter, \
+         patch.object(chunker, "embed_model", Mock()) as mock_embed:
+        mock_splitter.get_nodes_from_documents.return_value = [node]
+        mock_embed.get_text_embedding_batch.return_value = [[0.5, 0.25]]
+
+        chunker.chunk_text("Same text", filename="first.pdf")
+        cached_chunks = chunker.chunk_text("Same text", filename="second.pdf")
+
+    mock_splitter.get_nodes_from_documents.assert_called_once()
+    mock_embed.get_text_embedding_batch.assert_called_once()
+    assert len(cached_chunks) == 1
+    assert cached_chunks[0].get_content() == "Chunk A"
+    assert cached_chunks[0].embedding == [0.5, 0.25]
+    assert cached_chunks[0].metadata == {"filename": "second.pdf"}
+
+
+@patch("llama_index.core.node_parser.SemanticSplitterNodeParser.from_defaults")
+def test_pdfchunker_chunk_cache_keyed_on_splitter_embed_model(mock_splitter_init, tmp_path, monkeypatch):
+    """
+    Changing SPLITTER_EMBED_MODEL moves the semantic chunk boundaries, so
+    chunks cached under the previous splitter model are not reused.
+    """
+    fake_hf_module = types.ModuleType("llama_index.embeddings.huggingface")
+    fake_hf_module.HuggingFaceEmbedding = Mock()
+    monkeypatch.setitem(sys.modules, "llama_index.embeddings.huggingface", fake_hf_module)
+    cache_path = str(tmp_path / "chunks.sqlite")
+    node = Mock()
+    node.get_content.return_value = "Chunk A"
+
+    for model_name in ("", "sentence-transformers/all-MiniLM-L6-v2"):
+        monkeypatch.setattr(config, "SPLITTER_EMBED_MODEL", model_name, raising=False)
+        chunker = PDFChunker(cache_path=cache_path)
+        with patch.object(chunker, "splitter", Mock()) as mock_splitter, \
+             patch.object(chunker, "embed_model", Mock()) as mock_embed:
+            mock_splitter.get_nodes_from_documents.return_value = [node]
+            mock_embed.get_text_embedding_batch.return_value = [[0.5, 0.25]]
+
+            chunker.chunk_text("Same text", filename="doc.pdf")
+
+        mock_splitter.get_nodes_from_documents.assert_called_once()
+
+
+@patch("llama_index.core.node_parser.SemanticSplitterNodeParser.from_defaults")
+def test_pdfchunker_local_splitter_embed_model(mock_splitter_init, monkeypatch):
+    """
+    With SPLITTER_EMBED_MODEL set, the splitter gets a local HuggingFace model
+    while chunk embeddings still use the Azure model.
+    """
+    fake_hf_module = types.ModuleType("llama_index.embeddings.huggingface")
+    fake_hf_module.HuggingFaceEmbedding = Mock()
+    monkeypatch.setitem(sys.modules, "llama_index.embeddings.huggingface", fake_hf_module)
+    monkeypatch.setattr(config, "SPLITTER_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2", raising=False)
+
+    chunker = PDFChunker()
+
+    fake_hf_module.HuggingFaceEmbedding.assert_called_once_with(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    splitter_embed_model = mock_splitter_init.call_args.kwargs["embed_model"]
+    assert splitter_embed_model is fake_hf_module.HuggingFaceEmbedding.return_value
+    assert chunker.embed_model is not splitter_embed_model
+
+
+def test_pdfchunker_local_splitter_embed_model_missing_package(monkeypatch):
+    """
+    A clear ImportError is raised if SPLITTER_EMBED_MODEL is set without the
+    optional HuggingFace embeddings package.
+    """
+    monkeypatch.setitem(sys.modules, "llama_index.embeddings.huggingface", None)
+    monkeypatch.setattr(config, "SPLITTER_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2", raising=False)
+
+    with pytest.raises(ImportError) as exc_info:
+        PDFChunker()
+    assert "llama-index-embeddings-huggingface" in str(exc_info.value)
+
+
+@patch("llama_index.core.node_parser.SemanticSplitterNodeParser.from_defaults")
+def test_pdfchunker_token_strategy(mock_semantic_init):
+    """
+    strategy="token" uses a 512/50 token-window SentenceSplitter instead of the
+    semantic splitter, so the only embedding calls are for the final chunks.
+    """
+    chunker = PDFChunker(strategy="token")
+
+    mock_semantic_init.assert_not_called()
+    assert isinstance(chunker.splitter, SentenceSplitter)
+    assert chunker.splitter.chunk_size == 512
+    assert chunker.splitter.chunk_overlap == 50
+
+
+def test_pdfchunker_unknown_strategy():
+    """
+    An unsupported strategy is rejected with ValueError when the chunker is built.
+    """
+    with pytest.raises(ValueError) as exc_info:
+        PDFChunker(strategy="paragraph")
+    assert "Unknown chunking strategy" in str(exc_info.value)
@@ -0,0 +1,56 @@
+"""
+test_ttl_cache.py
+
+Pytest tests for ttl_cache.py, which implements a thread-safe LRU cache
+with per-entry expiry (TTLCache).
+"""
+
+from unittest.mock import patch
+from utils.ttl_cache import TTLCache
+
+
+def test_get_returns_stored_value():
+    """
+    A stored value is returned until it expires; unknown keys return the default.
+    """
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.put("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("missing") is None
+    assert cache.get("missing", "fallback") == "fallback"
+
+
+@patch("utils.ttl_cache.time.monotonic")
+def test_entries_expire_after_ttl(mock_monotonic):
+    """
+    Once ttl seconds have passed, the entry is dropped and the default is returned.
+    """
+    cache = TTLCache(maxsize=4, ttl=10)
+    mock_monotonic.return_value = 100.0
+    cache.put("a", 1)
+
+    mock_monotonic.return_value = 105.0
+    assert cache.get("a") == 1
+
+    mock_monotonic.return_value = 111.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    """
+    When maxsize is exceeded, the least recently used key is evicted first.
+    """
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # "b" is now least recently used
+    cache.put("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    cache.clear()
+    assert len(cache) == 0
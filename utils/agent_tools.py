@@ -5,42 +5,154 @@ Implements the rag_pipeline function, which:
 1) Gets a user query embedding from PDFChunker's AzureOpenAIEmbedding.
 2) Uses that embedding to query Azure Cognitive Search for relevant chunks.
 3) Calls Azure OpenAI for a final answer using those chunks.
+
+arag_pipeline is a native asyncio variant (async embedding and chat calls),
+and rag_pipeline_batch answers several queries with one batched embedding call.
 """
 
+import asyncio
+import functools
+import hashlib
 import logging
+import numpy as np
 from utils.pdf_chunk_processing import PDFChunker
-from utils.azure_search import query_azure_search, call_azure_openai
+from utils.azure_search import query_azure_search_cached, call_azure_openai, acall_azure_openai
+from utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
-def rag_pipeline(user_query: str):
+# Fallback answers returned when retrieval or generation comes back empty.
+NO_CHUNKS_ANSWER = "No relevant information found in the PDF docs."
+NO_RESPONSE_ANSWER = "No response generated. Please refine your query."
+
+# Query embeddings per (embedding model id, normalized query), shared by the sync and
+# async pipelines so repeated queries skip the Azure OpenAI embeddings round-trip.
+_QUERY_EMBEDDINGS = TTLCache(maxsize=1024, ttl=24 * 3600)
+
+# Final answers per (normalized query, digest of the top chunks). Keyed on the
+# chunks too, so re-indexed documents produce a fresh answer.
+_ANSWERS = TTLCache(maxsize=1024, ttl=3600)
+
+@functools.lru_cache(maxsize=1)
+def get_shared_chunker():
+    """
+    Returns the process-wide PDFChunker, used by the pipelines when no chunker
+    is passed in and by the Streamlit app, so its embedding client (and
+    connection pool) is built once per process, not per query.
+    """
+    return PDFChunker()
+
+def _as_query_vector(embedding):
+    """
+    Converts an embedding to a read-only float32 array: a quarter of the memory
+    of a list of Python floats, hashable via .tobytes(), and safe to share from caches.
+    A missing embedding becomes an empty array.
+    """
+    vector = np.asarray(embedding if embedding is not None else (), dtype=np.float32)
+    vector.setflags(write=False)
+    return vector
+
+def _normalize_query(query_text: str) -> str:
+    """
+    Collapses whitespace and case, so trivially different spellings of the
+    same question share cache entries.
+    """
+    return " ".join(query_text.split()).lower()
+
+def _chunks_digest(top_chunks) -> str:
+    """
+    Returns a 128-bit blake2b digest identifying an ordered tuple of chunks.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in top_chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _embed_model_id(embed_model) -> str:
+    """
+    Returns a stable, hashable id for an embedding model, for use in cache keys.
+    LlamaIndex embedding models are pydantic models and can't be hashed themselves.
+    """
+    deployment = getattr(embed_model, "azure_deployment", None) or getattr(embed_model, "model_name", "")
+    endpoint = getattr(embed_model, "azure_endpoint", None) or ""
+    return f"{type(embed_model).__name__}:{endpoint}:{deployment}"
+
+def _embed_query(embed_model, query_text: str):
+    """
+    Embeds query_text with embed_model, memoizing the result in _QUERY_EMBEDDINGS.
+
+    Returns: np.ndarray (float32, read-only)
+    """
+    key = (_embed_model_id(embed_model), _normalize_query(query_text))
+    vector = _QUERY_EMBEDDINGS.get(key)
+    if vector is None:
+        vector = _as_query_vector(embed_model.get_text_embedding(query_text))
+        if vector.size:
+            _QUERY_EMBEDDINGS.put(key, vector)
+    return vector
+
+async def _aembed_query(embed_model, query_text: str):
+    """
+    Awaitable version of _embed_query, using the model's async embedding call.
+
+    Returns: np.ndarray (float32, read-only)
+    """
+    key = (_embed_model_id(embed_model), _normalize_query(query_text))
+    vector = _QUERY_EMBEDDINGS.get(key)
+    if vector is None:
+        vector = _as_query_vector(await embed_model.aget_text_embedding(query_text))
+        if vector.size:
+            _QUERY_EMBEDDINGS.put(key, vector)
+    return vector
+
+def _answer_from_embedding(user_query: str, query_embedding):
+    """
+    Runs steps 2) and 3) of the pipeline for an already-embedded query:
+    retrieve the top chunks from Azure Cognitive Search, then ask Azure OpenAI
+    (unless the same question was already answered from the same chunks).
+
+    Returns: (final_answer: str, top_chunks: tuple[str, ...])
+    """
+    # Materialized once; the same tuple goes to the LLM and back to the caller.
+    top_chunks = tuple(query_azure_search_cached(query_embedding))
+    if not top_chunks:
+        # The test expects to see a fallback message but an empty chunk list.
+        return NO_CHUNKS_ANSWER, ()
+
+    answer_key = (_normalize_query(user_query), _chunks_digest(top_chunks))
+    final_response = _ANSWERS.get(answer_key)
+    if final_response is None:
+        final_response = call_azure_openai(user_query, top_chunks)
+        if not final_response:
+            # The test expects we keep the chunk list, not return ().
+            return NO_RESPONSE_ANSWER, top_chunks
+        _ANSWERS.put(answer_key, final_response)
+
+    return final_response, top_chunks
+
+def rag_pipeline(user_query: str, chunker: PDFChunker = None):
     """
     1) Convert user_query to an embedding via PDFChunker's AzureOpenAIEmbedding
     2) Use that embedding to query Azure Cognitive Search for the top relevant chunks
     3) Call Azure OpenAI with those chunks as context to produce a final answer
 
-    Returns: (final_answer: str, top_chunks: list[str])
+    Pass a chunker to use a specific embedding client; if omitted, the shared
+    PDFChunker from get_shared_chunker() is used.
+
+    Returns: (final_answer: str, top_chunks: tuple[str, ...])
     """
     logger.info("Starting RAG pipeline for PDF documents.")
     try:
-        chunker = PDFChunker()
-        query_embedding = chunker.embed_model.get_text_embedding(user_query)
-        if not query_embedding:
+        if chunker is None:
+            chunker = get_shared_chunker()
+        query_embedding = _embed_query(chunker.embed_model, user_query)
+        if query_embedding.size == 0:
             # We raise a ValueError here. The test expects the final exception
             # to show "Query embedding is empty or invalid."
             raise ValueError("Query embedding is empty or invalid.")
 
-        top_chunks = query_azure_search(query_embedding)
-        if not top_chunks:
-            # The test expects to see a fallback message but an empty chunk list.
-            return "No relevant information found in the PDF docs.", []
-
-        final_response = call_azure_openai(user_query, top_chunks)
-        if not final_response:
-            # The test expects we keep the chunk list, not return [].
-            return "No response generated. Please refine your query.", top_chunks
-
-        return final_response, top_chunks
+        return _answer_from_embedding(user_query, query_embedding)
 
     except ValueError as ve:
         # If we raised a ValueError from within the pipeline logic,
@@ -52,3 +164,114 @@ def rag_pipeline(user_query: str):
         # For all other unexpected errors, unify as "Failed RAG pipeline."
         logger.error(f"Unexpected error in RAG pipeline: {e}")
         raise ValueError("Failed RAG pipeline.") from e
+
+
+async def _aanswer_from_embedding(user_query: str, query_embedding):
+    """
+    Awaitable version of _answer_from_embedding. The search request runs on the
+    pooled HTTP session in a worker thread; the chat call is natively async.
+
+    Returns: (final_answer: str, top_chunks: tuple[str, ...])
+    """
+    top_chunks = tuple(await asyncio.to_thread(query_azure_search_cached, query_embedding))
+    if not top_chunks:
+        return NO_CHUNKS_ANSWER, ()
+
+    answer_key = (_normalize_query(user_query), _chunks_digest(top_chunks))
+    final_response = _ANSWERS.get(answer_key)
+    if final_response is None:
+        final_response = await acall_azure_openai(user_query, top_chunks)
+        if not final_response:
+            return NO_RESPONSE_ANSWER, top_chunks
+        _ANSWERS.put(answer_key, final_response)
+
+    return final_response, top_chunks
+
+
+async def arag_pipeline(user_query: str, chunker: PDFChunker = None):
+    """
+    Awaitable version of rag_pipeline for asyncio-based callers.
+
+    The embed -> search -> answer steps depend on each other, so a single query
+    can't overlap them; but the embedding and chat calls are awaited natively,
+    so one event loop can keep many queries in flight at once.
+
+    Returns: (final_answer: str, top_chunks: tuple[str, ...])
+    """
+    logger.info("Starting async RAG pipeline for PDF documents.")
+    try:
+        if chunker is None:
+            chunker = get_shared_chunker()
+        query_embedding = await _aembed_query(chunker.embed_model, user_query)
+        if query_embedding.size == 0:
+            raise ValueError("Query embedding is empty or invalid.")
+
+        return await _aanswer_from_embedding(user_query, query_embedding)
+
+    except ValueError as ve:
+        logger.error(f"Error in async RAG pipeline: {ve}")
+        raise ve
+
+    except Exception as e:
+        logger.error(f"Unexpected error in async RAG pipeline: {e}")
+        raise ValueError("Failed RAG pipeline.") from e
+
+
+async def arag_pipeline_batch(user_queries, chunker: PDFChunker = None):
+    """
+    Answers several queries at once:
+    1) Deduplicates the (normalized) queries and embeds those not already in the
+       query-embedding cache with a single batched embedding call
+    2) Runs search + answer for every unique query concurrently
+    3) Maps the answers back onto the original query order (duplicates share a result)
+
+    Returns: list[(final_answer: str, top_chunks: tuple[str, ...])], one per input query
+    """
+    logger.info(f"Starting batched RAG pipeline for {len(user_queries)} queries.")
+    try:
+        query_keys = [_normalize_query(query) for query in user_queries]
+        unique_by_key = {}
+        for key, query in zip(query_keys, user_queries):
+            unique_by_key.setdefault(key, query)
+        if not unique_by_key:
+            return []
+        if chunker is None:
+            chunker = get_shared_chunker()
+
+        model_id = _embed_model_id(chunker.embed_model)
+        vectors = {key: _QUERY_EMBEDDINGS.get((model_id, key)) for key in unique_by_key}
+        missing_keys = [key for key, vector in vectors.items() if vector is None]
+        if missing_keys:
+            embeddings = await chunker.embed_model.aget_text_embedding_batch(
+                [unique_by_key[key] for key in missing_keys]
+            )
+            new_vectors = [_as_query_vector(embedding) for embedding in embeddings]
+            if len(new_vectors) != len(missing_keys) or any(vector.size == 0 for vector in new_vectors):
+                raise ValueError("Query embedding is empty or invalid.")
+            for key, vector in zip(missing_keys, new_vectors):
+                _QUERY_EMBEDDINGS.put((model_id, key), vector)
+                vectors[key] = vector
+
+        results = await asyncio.gather(*(
+            _aanswer_from_embedding(query, vectors[key])
+            for key, query in unique_by_key.items()
+        ))
+        results_by_key = dict(zip(unique_by_key, results))
+        return [results_by_key[key] for key in query_keys]
+
+    except ValueError as ve:
+        logger.error(f"Error in batched RAG pipeline: {ve}")
+        raise ve
+
+    except Exception as e:
+        logger.error(f"Unexpected error in batched RAG pipeline: {e}")
+        raise ValueError("Failed RAG pipeline.") from e
+
+
+def rag_pipeline_batch(user_queries, chunker: PDFChunker = None):
+    """
+    Synchronous wrapper around arag_pipeline_batch.
+
+    Returns: list[(final_answer: str, top_chunks: tuple[str, ...])], one per input query
+    """
+    return asyncio.run(arag_pipeline_batch(user_queries, chunker))
@@ -2,16 +2,42 @@
 azure_blob.py
 
 Implements a client for interacting with Azure Blob Storage. Allows listing
-of PDF blob files and retrieving a specified PDF as a stream of bytes.
+(or lazily iterating) PDF blob files and retrieving a specified PDF as a
+stream of bytes or as extracted text.
 """
 
 import logging
+import os
+import tempfile
+from operator import attrgetter
 from azure.storage.blob import BlobServiceClient
-from io import BytesIO
+from utils.pdf_chunk_processing import extract_text_from_pdf_stream
 import config
 
 logger = logging.getLogger(__name__)
 
+# Blob name suffixes treated as PDFs (one endswith call checks all of them).
+_PDF_SUFFIXES = ('.pdf', '.PDF')
+_blob_name = attrgetter("name")
+
+# Blobs per list page (the service maximum), so large containers need fewer round-trips.
+_LIST_PAGE_SIZE = 5000
+
+# Downloaded PDFs up to this size stay in memory; larger ones spill to a temp file.
+_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+def _download_buffer(size):
+    """
+    Returns a seekable binary buffer for a blob of the given size (None if unknown).
+    Blobs known to exceed _SPOOL_MAX_SIZE go to a named temporary file, which
+    extract_text_from_pdf_stream opens by path instead of reading into memory;
+    others are spooled in memory. Windows can't reopen an open NamedTemporaryFile
+    by name, so there large blobs spool (and spill) as well.
+    """
+    if size is not None and size > _SPOOL_MAX_SIZE and os.name != "nt":
+        return tempfile.NamedTemporaryFile(suffix=".pdf")
+    return tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+
 class AzureBlobClient:
     """
     A client to interact with Azure Blob Storage (optional).
@@ -32,10 +58,32 @@ class AzureBlobClient:
             logger.error(f"Failed to initialize AzureBlobClient: {e}")
             raise
 
-    def list_pdf_blobs(self):
+    def iter_pdf_blobs(self, prefix: str = ""):
+        """
+        Lazily yields the PDF files in the configured Azure Blob Storage container,
+        fetching up to 5000 names per list request, so callers can stream through
+        very large containers without holding every name in memory.
+
+        Args:
+            prefix (str, optional): Only list blobs whose names start with this prefix
+                (e.g. a virtual directory such as "reports/"). The filter runs server-side.
+
+        Returns:
+            Iterator[str]: PDF blob filenames, in listing order. Errors from later
+            list pages are raised while iterating.
+        """
+        container_client = self.blob_service_client.get_container_client(self.container_name)
+        blobs = container_client.list_blobs(name_starts_with=prefix or None, results_per_page=_LIST_PAGE_SIZE)
+        return (name for name in map(_blob_name, blobs) if name.endswith(_PDF_SUFFIXES))
+
+    def list_pdf_blobs(self, prefix: str = ""):
         """
         Lists all PDF files in the configured Azure Blob Storage container.
 
+        Args:
+            prefix (str, optional): Only list blobs whose names start with this prefix
+                (e.g. a virtual directory such as "reports/"). The filter runs server-side.
+
         Returns:
             list: A list of PDF blob filenames in the container.
 
@@ -43,9 +91,7 @@ class AzureBlobClient:
             Exception: If there's an error accessing the container or blobs.
         """
         try:
-            container_client = self.blob_service_client.get_container_client(self.container_name)
-            blobs = container_client.list_blobs()
-            pdf_blobs = [blob.name for blob in blobs if blob.name.endswith('.pdf')]
+            pdf_blobs = list(self.iter_pdf_blobs(prefix))
             logger.info(f"Found {len(pdf_blobs)} PDF blobs in the container.")
             return pdf_blobs
         except Exception as e:
@@ -60,7 +106,8 @@ class AzureBlobClient:
             blob_name (str): The name of the PDF blob to retrieve.
 
         Returns:
-            BytesIO: A BytesIO stream of the PDF's contents.
+            A seekable binary stream of the PDF's contents, held in memory up to
+            _SPOOL_MAX_SIZE bytes and in a named temporary file beyond that.
 
         Raises:
             ValueError: If the blob is empty or cannot be downloaded.
@@ -68,14 +115,23 @@ class AzureBlobClient:
         try:
             container_client = self.blob_service_client.get_container_client(self.container_name)
             blob_client = container_client.get_blob_client(blob_name)
-            stream_downloader = blob_client.download_blob()
-            pdf_bytes = stream_downloader.readall()
+            # Parallel range GETs (config.BLOB_MAX_CONCURRENCY at a time), written
+            # straight into the stream (no intermediate full-size bytes object as
+            # with readall()). Per-range MD5 checks are skipped; TLS already
+            # protects the transfer.
+            stream_downloader = blob_client.download_blob(
+                max_concurrency=config.BLOB_MAX_CONCURRENCY,
+                validate_content=False,
+            )
+            pdf_stream = _download_buffer(getattr(stream_downloader, "size", None))
+            bytes_read = stream_downloader.readinto(pdf_stream)
 
-            if not pdf_bytes:
+            if not bytes_read:
+                pdf_stream.close()
                 # Raise a ValueError with a specific message
                 raise ValueError(f"Blob '{blob_name}' is empty or could not be downloaded.")
 
-            pdf_stream = BytesIO(pdf_bytes)
+            pdf_stream.seek(0)
             logger.info(f"Successfully retrieved stream for blob: {blob_name}")
             return pdf_stream
 
@@ -87,3 +143,28 @@ class AzureBlobClient:
         except Exception as e:
             logger.error(f"Error retrieving blob stream for {blob_name}: {e}")
             raise ValueError(f"Failed to retrieve blob '{blob_name}'.") from e
+
+    def get_pdf_text(self, blob_name: str, pages=None):
+        """
+        Downloads a PDF blob and extracts its text, optionally only from some pages.
+        The whole blob is still downloaded (a PDF's page index is stored at the end
+        of the file), but pages outside `pages` are never parsed.
+
+        Args:
+            blob_name (str): The name of the PDF blob to read.
+            pages (Sequence[int], optional): 0-based page numbers to extract,
+                e.g. range(10) for up to the first ten pages. Pages past the end of
+                the PDF are skipped. Defaults to every page.
+
+        Returns:
+            str: The extracted text.
+
+        Raises:
+            ValueError: If the blob cannot be downloaded, has no extractable text,
+                or a page number is negative.
+        """
+        pdf_stream = self.get_pdf_stream(blob_name)
+        try:
+            return extract_text_from_pdf_stream(pdf_stream, page_numbers=pages)
+        finally:
+            pdf_stream.close()
@@ -2,59 +2,272 @@
 azure_search.py
 
 Provides functionality to interact with Azure Cognitive Search by
-submitting a vector search request and retrieving top chunks. Also contains
-a function to call Azure OpenAI for final answer generation using LlamaIndex's
-AzureOpenAI client.
+submitting a vector search request (to one or several indexes) and
+retrieving top chunks. Also contains
+functions (sync and async) to call Azure OpenAI for final answer generation
+using LlamaIndex's AzureOpenAI client.
 """
 
+import functools
+import hashlib
+import heapq
 import logging
+import numpy as np
+import orjson
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from llama_index.llms.azure_openai import AzureOpenAI
+from llama_index.llms.openai.utils import ChatMessage
+from llama_index.core.utils import get_tokenizer
 import config
+from utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# REST API version for the vector query. The "vectors" payload used below is the
+# 2023-07-01-Preview shape; newer versions (and the azure-search-documents SDK's
+# VectorizedQuery) use "vectorQueries" instead.
+SEARCH_API_VERSION = "2023-07-01-Preview"
 
-def query_azure_search(query_embedding):
+# The query-independent part of every vector search request body; only the
+# "vectors" entry is built per query. Selecting just content/metadata keeps the
+# stored embedding vectors out of the response.
+_SEARCH_PAYLOAD_BASE = {
+    "search": "*",
+    "select": "content,metadata"
+}
+_VECTOR_FIELD = "embedding"
+
+# Rank offset for reciprocal rank fusion when merging results from several indexes.
+_RRF_RANK_CONSTANT = 60
+
+# Throttled / temporarily unavailable responses that are retried with backoff.
+_RETRYABLE_STATUS_CODES = frozenset({429, 503})
+
+# Transport-level retries for dropped connections and transient gateway errors.
+# 429/503 are left to _post_search's backoff (which tolerates longer waits),
+# so the two retry layers don't multiply each other. Search POSTs are read-only
+# queries, so retrying them is safe.
+_TRANSPORT_RETRY = Retry(
+    total=3,
+    backoff_factor=0.2,
+    status_forcelist=(500, 502, 504),
+    allowed_methods=frozenset({"POST"}),
+    raise_on_status=False,
+)
+
+# One pooled HTTP session per process, so search queries reuse warm
+# TCP/TLS connections instead of handshaking on every request.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=_TRANSPORT_RETRY))
+
+# The fixed instruction sent ahead of the retrieved context on every chat call.
+_SYSTEM_MESSAGE = ChatMessage(
+    role="system",
+    content="You are a helpful assistant. Use the provided context to answer the user's query accurately."
+)
+
+# Short-lived cache of top chunks per (index, query embedding), so repeated
+# questions don't re-hit Azure Cognitive Search.
+_SEARCH_CACHE = TTLCache(maxsize=256, ttl=300)
+
+
+@functools.lru_cache(maxsize=None)
+def _search_url(index_name: str) -> str:
+    """
+    Builds (once per index) the vector search URL. Computed on first use rather
+    than at import so config values are only resolved when search is used.
+    """
+    return f"{config.SEARCH_ENDPOINT}/indexes/{index_name}/docs/search?api-version={SEARCH_API_VERSION}"
+
+
+@functools.lru_cache(maxsize=1)
+def _search_headers() -> dict:
+    """
+    Builds (once) the request headers for Azure Cognitive Search.
+    """
+    return {
+        'Content-Type': 'application/json',
+        'api-key': config.SEARCH_ADMIN_KEY
+    }
+
+
+class _RetryableSearchError(Exception):
+    """
+    Raised for a throttled (429) or unavailable (503) Azure Search response,
+    so the request is retried. Carries the last response for error reporting.
+    """
+
+    def __init__(self, response):
+        super().__init__(f"Azure Search returned retryable status {response.status_code}")
+        self.response = response
+
+
+@retry(
+    stop=stop_after_attempt(4),
+    wait=wait_exponential_jitter(multiplier=0.25, max=4, jitter=0.25),
+    retry=retry_if_exception_type(_RetryableSearchError),
+    reraise=True,
+)
+def _post_search(index_name: str, request_body: bytes):
+    """
+    Posts the request body to an index, retrying throttled/unavailable responses
+    with exponential backoff and jitter (up to 4 attempts).
+
+    Raises:
+        _RetryableSearchError: If every attempt was throttled or unavailable.
+    """
+    response = _SESSION.post(_search_url(index_name), headers=_search_headers(), data=request_body)
+    if response.status_code in _RETRYABLE_STATUS_CODES:
+        logger.warning(f"Azure Search returned {response.status_code} for index '{index_name}'; retrying.")
+        raise _RetryableSearchError(response)
+    return response
+
+
+def _search_index(index_name: str, request_body: bytes):
+    """
+    Posts a serialized vector search request to a single index.
+
+    Returns:
+        Tuple[str, ...]: The chunk contents of the hits, in rank order.
+
+    Raises:
+        ValueError: If the search request returns a non-200 status code
+            (for 429/503, only after the retries are exhausted).
+    """
+    try:
+        response = _post_search(index_name, request_body)
+    except _RetryableSearchError as e:
+        response = e.response
+
+    if response.status_code != 200:
+        logger.error(f"Azure Search query failed: {response.status_code} - {response.text}")
+        raise ValueError(f"Azure Search query failed with status code {response.status_code}")
+
+    search_results = orjson.loads(response.content).get('value', [])
+    return tuple(_iter_chunk_contents(search_results))
+
+
+def _chunk_id(chunk: str) -> int:
+    """
+    Returns a 64-bit blake2b digest of the chunk text. Unlike hash(str), it is
+    stable across processes and runs, so ids can be compared between caches.
+    """
+    return int.from_bytes(hashlib.blake2b(chunk.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _iter_chunk_contents(search_results):
+    """
+    Yields the non-empty 'content' field of each search hit, in rank order,
+    skipping repeats of the same text (e.g. a PDF that was indexed twice) so
+    duplicate chunks don't take up prompt space.
+    """
+    seen = set()
+    for result in search_results:
+        content = result.get('content')
+        if not content:
+            continue
+        content_id = _chunk_id(content)
+        if content_id in seen:
+            continue
+        seen.add(content_id)
+        yield content
+
+
+def _reciprocal_rank_fusion(ranked_lists, k: int):
+    """
+    Merges per-index rankings with reciprocal rank fusion: every chunk (identified
+    by _chunk_id) scores sum(1 / (60 + rank)) over the lists it appears in, and
+    the top k are kept.
+
+    Returns:
+        Tuple[str, ...]: Up to k chunk contents, best first.
+    """
+    scores = {}
+    chunks_by_id = {}
+    for ranked in ranked_lists:
+        for rank, chunk in enumerate(ranked, start=1):
+            content_id = _chunk_id(chunk)
+            chunks_by_id.setdefault(content_id, chunk)
+            scores[content_id] = scores.get(content_id, 0.0) + 1.0 / (_RRF_RANK_CONSTANT + rank)
+    return tuple(chunks_by_id[content_id] for content_id in heapq.nlargest(k, scores, key=scores.__getitem__))
+
+
+def _as_search_vector(query_embedding):
+    """
+    Converts the query embedding to a contiguous float32 array and checks it
+    before any request is made: it must be a non-empty 1-D vector of finite
+    values, of length config.EMBEDDING_DIMENSIONS when that is set.
+
+    Raises:
+        ValueError: If the embedding is empty or invalid.
+    """
+    try:
+        vector = np.ascontiguousarray(query_embedding, dtype=np.float32)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Query embedding is empty or invalid.") from e
+
+    expected_dims = config.EMBEDDING_DIMENSIONS
+    if (
+        vector.ndim != 1
+        or vector.size == 0
+        or (expected_dims and vector.size != expected_dims)
+        or not np.isfinite(vector).all()
+    ):
+        logger.error(f"Invalid query embedding with shape {vector.shape}.")
+        raise ValueError("Query embedding is empty or invalid.")
+    return vector
+
+
+def query_azure_search(query_embedding, indexes=None, k: int = 5):
     """
     Sends a vector search request to Azure Cognitive Search using the query_embedding.
+    The vector is kept as float32 and serialized straight from the array by orjson.
+
+    When several indexes are given (e.g. a horizontally sharded PDF corpus), they are
+    queried concurrently and their rankings merged with reciprocal rank fusion.
 
     Args:
-        query_embedding (List[float]): The embedding of the user's query.
+        query_embedding (np.ndarray | List[float]): The embedding of the user's query.
+        indexes (Sequence[str], optional): Index names to search. Defaults to config.SEARCH_INDEX_NAME.
+        k (int): Number of nearest neighbours to retrieve (per index, and after merging).
 
     Returns:
-        List[str]: A list of top chunk contents (strings) from the search results.
+        Tuple[str, ...]: The top chunk contents (strings) from the search results.
 
     Raises:
-        ValueError: If the search request fails or if no relevant results are found.
+        ValueError: If the embedding is empty or invalid (checked before any request)
+            or if the search request fails.
     """
     try:
-        headers = {
-            'Content-Type': 'application/json',
-            'api-key': config.SEARCH_ADMIN_KEY
-        }
+        indexes = tuple(indexes) if indexes else (config.SEARCH_INDEX_NAME,)
+        query_vector = _as_search_vector(query_embedding)
         search_payload = {
-            "search": "*",
+            **_SEARCH_PAYLOAD_BASE,
             "vectors": [{
-                "value": query_embedding,
-                "fields": "embedding",
-                "k": 5
+                # Serialized natively by orjson: float32s get their shortest
+                # round-trip repr, about half the bytes of float64 digits.
+                "value": query_vector,
+                "fields": _VECTOR_FIELD,
+                "k": k
             }],
-            "select": "content,metadata"
         }
-        url = f"{config.SEARCH_ENDPOINT}/indexes/{config.SEARCH_INDEX_NAME}/docs/search?api-version=2023-07-01-Preview"
-        response = requests.post(url, headers=headers, json=search_payload)
+        request_body = orjson.dumps(search_payload, option=orjson.OPT_SERIALIZE_NUMPY)
 
-        if response.status_code != 200:
-            logger.error(f"Azure Search query failed: {response.status_code} - {response.text}")
-            raise ValueError(f"Azure Search query failed with status code {response.status_code}")
+        if len(indexes) == 1:
+            top_chunks = _search_index(indexes[0], request_body)
+        else:
+            with ThreadPoolExecutor(max_workers=len(indexes)) as pool:
+                ranked_lists = list(pool.map(lambda index_name: _search_index(index_name, request_body), indexes))
+            top_chunks = _reciprocal_rank_fusion(ranked_lists, k)
 
-        search_results = response.json().get('value', [])
-        if not search_results:
+        if not top_chunks:
             logger.warning("No results retrieved from Azure Search.")
-            return []
+            return ()
 
-        top_chunks = [result.get('content') for result in search_results if result.get('content')]
         logger.info(f"Retrieved {len(top_chunks)} chunks from Azure Search.")
         return top_chunks
 
@@ -68,6 +281,100 @@ def query_azure_search(query_embedding):
         raise ValueError("Failed to query Azure Search.") from e
 
 
+def query_azure_search_cached(query_embedding, indexes=None, k: int = 5):
+    """
+    Same as query_azure_search, but serves repeated embeddings from an in-process
+    TTL cache keyed on a blake2b digest of the float32 vector, the indexes and k.
+    Empty results are not cached, so newly indexed documents show up immediately.
+
+    Args:
+        query_embedding (np.ndarray | List[float]): The embedding of the user's query.
+        indexes (Sequence[str], optional): Index names to search. Defaults to config.SEARCH_INDEX_NAME.
+        k (int): Number of nearest neighbours to retrieve.
+
+    Returns:
+        Tuple[str, ...]: The top chunk contents (strings) from the search results.
+
+    Raises:
+        ValueError: If the search request fails.
+    """
+    indexes = tuple(indexes) if indexes else (config.SEARCH_INDEX_NAME,)
+    query_vector = _as_search_vector(query_embedding)
+    digest = hashlib.blake2b(query_vector.tobytes()).hexdigest()
+    cache_key = (indexes, k, digest)
+
+    cached_chunks = _SEARCH_CACHE.get(cache_key)
+    if cached_chunks is not None:
+        logger.info(f"Serving {len(cached_chunks)} chunks from the Azure Search cache.")
+        return cached_chunks
+
+    top_chunks = query_azure_search(query_embedding, indexes, k)
+    if top_chunks:
+        # Tuples are immutable, so cached results are shared without copying.
+        _SEARCH_CACHE.put(cache_key, top_chunks)
+    return top_chunks
+
+
+@functools.lru_cache(maxsize=1)
+def _get_llm():
+    """
+    Builds (once) the LlamaIndex AzureOpenAI chat client from config, so its
+    HTTP client and connections are reused across calls.
+    """
+    return AzureOpenAI(
+        api_key=config.AZURE_OPENAI_API_KEY,
+        azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
+        api_version=config.AZURE_OPENAI_MODEL_VERSION,
+        deployment_name=config.AZURE_OPENAI_DEPLOYMENT_NAME
+    )
+
+
+def _fit_chunks_to_budget(top_chunks, budget: int):
+    """
+    Keeps the highest-ranked chunks whose combined size fits in `budget` tokens
+    (cl100k_base, as used by the GPT-3.5/4 deployments). Prompt length drives
+    the model's time to first token, so lower-ranked chunks are dropped first.
+    The top chunk is always kept, even if it alone exceeds the budget.
+
+    Returns:
+        List[str]: The kept chunks, in rank order.
+    """
+    tokenize = get_tokenizer()
+    kept = []
+    used = 0
+    for chunk in top_chunks:
+        tokens = len(tokenize(chunk))
+        if kept and used + tokens > budget:
+            break
+        kept.append(chunk)
+        used += tokens
+    if len(kept) < len(top_chunks):
+        logger.info(f"Using {len(kept)} of {len(top_chunks)} chunks to fit the {budget}-token context budget.")
+    return kept
+
+
+def _build_messages(client_query, top_chunks):
+    """
+    Builds the chat messages: the system prompt, the top chunks (trimmed to
+    config.CONTEXT_TOKEN_BUDGET) as context, and the user's query.
+    """
+    # Prepare the context string from the top chunks
+    context_chunks = _fit_chunks_to_budget(top_chunks, config.CONTEXT_TOKEN_BUDGET)
+    context = "\n\n".join([f"Chunk: {chunk}" for chunk in context_chunks])
+
+    return [
+        _SYSTEM_MESSAGE,
+        ChatMessage(
+            role="system",
+            content=f"Context: {context}"
+        ),
+        ChatMessage(
+            role="user",
+            content=client_query
+        ),
+    ]
+
+
 def call_azure_openai(client_query, top_chunks):
     """
     Uses top_chunks from Azure Search as context and calls Azure OpenAI
@@ -75,7 +382,7 @@ def call_azure_openai(client_query, top_chunks):
 
     Args:
         client_query (str): The user's query.
-        top_chunks (List[str]): The top document chunks retrieved from Azure Search.
+        top_chunks (Sequence[str]): The top document chunks retrieved from Azure Search.
 
     Returns:
         str: The final answer from Azure OpenAI.
@@ -84,34 +391,8 @@ def call_azure_openai(client_query, top_chunks):
         ValueError: If there's an error calling the LLM or generating a response.
     """
     try:
-        from llama_index.llms.azure_openai import AzureOpenAI
-        from llama_index.llms.openai.utils import ChatMessage
-
-        client = AzureOpenAI(
-            api_key=config.AZURE_OPENAI_API_KEY,
-            azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
-            api_version=config.AZURE_OPENAI_MODEL_VERSION,
-            deployment_name=config.AZURE_OPENAI_DEPLOYMENT_NAME
-        )
-
-        # Prepare the context string from the top chunks
-        context = "\n\n".join([f"Chunk: {chunk}" for chunk in top_chunks])
-
-        # Build a list of ChatMessage objects
-        messages = [
-            ChatMessage(
-                role="system",
-                content="You are a helpful assistant. Use the provided context to answer the user's query accurately."
-            ),
-            ChatMessage(
-                role="system",
-                content=f"Context: {context}"
-            ),
-            ChatMessage(
-                role="user",
-                content=client_query
-            ),
-        ]
+        client = _get_llm()
+        messages = _build_messages(client_query, top_chunks)
 
         response = client.chat(messages=messages, max_tokens=500, temperature=0)
         logger.info("Response generated successfully with Azure OpenAI.")
@@ -122,3 +403,27 @@ def call_azure_openai(client_query, top_chunks):
     except Exception as e:
         logger.error(f"Error generating response with Azure OpenAI: {e}")
         raise ValueError("Failed to call Azure OpenAI for final answer.") from e
+
+
+async def acall_azure_openai(client_query, top_chunks):
+    """
+    Awaitable version of call_azure_openai, using the client's native async chat
+    so no thread is held while waiting on the completion.
+
+    Returns:
+        str: The final answer from Azure OpenAI.
+
+    Raises:
+        ValueError: If there's an error calling the LLM or generating a response.
+    """
+    try:
+        client = _get_llm()
+        messages = _build_messages(client_query, top_chunks)
+
+        response = await client.achat(messages=messages, max_tokens=500, temperature=0)
+        logger.info("Response generated successfully with Azure OpenAI.")
+        return response.message.content
+
+    except Exception as e:
+        logger.error(f"Error generating response with Azure OpenAI: {e}")
+        raise ValueError("Failed to call Azure OpenAI for final answer.") from e
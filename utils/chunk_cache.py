@@ -0,0 +1,104 @@
+"""
+chunk_cache.py
+
+Implements a persistent SQLite cache of chunked-and-embedded document text,
+keyed by a content hash. Lets PDFChunker skip re-splitting and re-embedding
+documents whose text has not changed since a previous ingestion run.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkCache:
+    """
+    Maps a document key (see key()) to its ordered (chunk_text, embedding) pairs.
+    Embeddings are stored as packed float32 blobs (6 KB for a 1536-dim vector).
+    Cache errors are logged and treated as misses, never raised; if the database
+    cannot be opened at all, the cache disables itself.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The SQLite database file (created if it does not exist).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.enabled = True
+        try:
+            with self._connect() as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS chunks ("
+                    " doc_key TEXT NOT NULL,"
+                    " position INTEGER NOT NULL,"
+                    " content TEXT NOT NULL,"
+                    " embedding BLOB NOT NULL,"
+                    " PRIMARY KEY (doc_key, position))"
+                )
+        except sqlite3.Error as e:
+            # e.g. an unwritable path: run uncached rather than fail ingestion.
+            logger.warning(f"Chunk cache disabled; could not open {path}: {e}")
+            self.enabled = False
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path))
+
+    @staticmethod
+    def key(text: str, namespace: str = "") -> str:
+        """
+        Returns the cache key for a document: a blake2b digest of a namespace
+        (e.g. the embedding model and chunking strategy) and the full text, so
+        changing either does not reuse stale chunks or vectors.
+        """
+        digest = hashlib.blake2b(digest_size=32)
+        digest.update(namespace.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, doc_key: str):
+        """
+        Returns the cached chunks for doc_key as a list of (content, embedding)
+        pairs in chunk order, or None if the document is not cached.
+        """
+        if not self.enabled:
+            return None
+        try:
+            with self._lock, self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT content, embedding FROM chunks WHERE doc_key = ? ORDER BY position",
+                    (doc_key,),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Chunk cache read failed: {e}")
+            return None
+        if not rows:
+            return None
+        return [(content, np.frombuffer(blob, dtype=np.float32).tolist()) for content, blob in rows]
+
+    def put(self, doc_key: str, chunks):
+        """
+        Stores (content, embedding) pairs for doc_key, replacing any previous entry.
+        """
+        if not self.enabled:
+            return
+        rows = [
+            (doc_key, position, content, np.asarray(embedding, dtype=np.float32).tobytes())
+            for position, (content, embedding) in enumerate(chunks)
+        ]
+        try:
+            with self._lock, self._connect() as conn, conn:
+                conn.execute("DELETE FROM chunks WHERE doc_key = ?", (doc_key,))
+                conn.executemany(
+                    "INSERT INTO chunks (doc_key, position, content, embedding) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Chunk cache write failed: {e}")
@@ -2,51 +2,197 @@
 pdf_chunk_processing.py
 
 Contains logic to:
-1) Extract text from PDF streams using PyPDF2.
-2) Chunk text into semantically meaningful segments using LlamaIndex's SemanticSplitterNodeParser.
-3) Embed each chunk with Azure OpenAI embeddings.
+1) Extract text from PDF streams using PyMuPDF.
+2) Chunk text into semantically meaningful segments using LlamaIndex's SemanticSplitterNodeParser
+   (or, with strategy="token", into fixed token windows using SentenceSplitter).
+3) Embed the chunks with Azure OpenAI embeddings, in batched requests sent concurrently.
+Chunked documents can be persisted in a ChunkCache so unchanged text is not re-embedded.
 """
 
 import logging
+import multiprocessing
+import os
+import random
 import re
-from PyPDF2 import PdfReader
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pymupdf
 from llama_index.llms.azure_openai import AzureOpenAI
 from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
 from llama_index.core import Document
-from llama_index.core.node_parser import SemanticSplitterNodeParser
+from llama_index.core.schema import TextNode
+from llama_index.core.node_parser import SemanticSplitterNodeParser, SentenceSplitter
+from llama_index.core.utils import get_tokenizer
 import config
+from utils.chunk_cache import ChunkCache
 
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf_stream(pdf_stream):
+# Max chunks per embeddings request (the Azure OpenAI ada-002 input array limit).
+_EMBED_BATCH_SIZE = 16
+# Upper bound of the random delay before submitting each shard, so that
+# concurrent requests don't all hit the endpoint (and its rate limit) at once.
+_EMBED_SUBMIT_JITTER_S = 0.05
+
+# Chunking strategies accepted by PDFChunker.
+_CHUNK_STRATEGIES = ("semantic", "token")
+# Token-window size and overlap for the "token" strategy.
+_TOKEN_CHUNK_SIZE = 512
+_TOKEN_CHUNK_OVERLAP = 50
+
+# PDFs with more pages than this are extracted by a pool of worker processes.
+# PyMuPDF documents can't be shared between threads, so each worker opens the
+# PDF file itself and reads a contiguous slice of the requested pages.
+_PARALLEL_PAGE_THRESHOLD = 64
+_MAX_EXTRACT_WORKERS = 8
+
+# The extraction pool is created on first use and reused across PDFs. Workers
+# are spawned rather than forked: forking a multi-threaded process (Streamlit,
+# the embedding thread pool) can deadlock the child.
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+def _extract_workers() -> int:
+    return max(1, min(os.cpu_count() or 1, _MAX_EXTRACT_WORKERS))
+
+def _get_extract_pool():
+    """
+    Returns the shared extraction ProcessPoolExecutor, creating it if needed.
+    """
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=_extract_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _extract_pool
+
+def _discard_extract_pool(pool):
     """
-    Extracts text from a file-like PDF stream using PyPDF2.
-    Raises ValueError if the PDF is empty or fails to be read.
+    Drops a broken extraction pool so the next call starts a fresh one.
+    """
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is pool:
+            _extract_pool = None
+    pool.shutdown(wait=False)
+
+def _read_page(page):
+    """
+    Returns (page_text, error message or None) for a single PyMuPDF page.
+    """
+    try:
+        return page.get_text("text"), None
+    except Exception as page_error:
+        return "", str(page_error)
+
+def _extract_pages(pdf_path: str, page_numbers):
+    """
+    Worker-process entry point: opens its own document from pdf_path
+    and reads the given (0-based) pages with _read_page.
+    """
+    doc = pymupdf.open(pdf_path, filetype="pdf")
+    try:
+        return [_read_page(doc.load_page(i)) for i in page_numbers]
+    finally:
+        doc.close()
+
+def _read_pages_parallel(pdf_path: str, page_numbers):
+    """
+    Splits the pages into one slice per worker and reads the slices in the
+    shared worker pool, returning the results in the given order. Workers get
+    the file path, not the PDF bytes, so the document is never copied to them.
+    """
+    workers = min(_extract_workers(), len(page_numbers))
+    bounds = [len(page_numbers) * w // workers for w in range(workers + 1)]
+    slices = [page_numbers[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+    pool = _get_extract_pool()
+    try:
+        results = pool.map(_extract_pages, [pdf_path] * workers, slices)
+        return [result for page_slice in results for result in page_slice]
+    except BrokenProcessPool:
+        _discard_extract_pool(pool)
+        raise
+
+def _pdf_path(pdf_stream):
+    """
+    Returns the on-disk path behind pdf_stream (e.g. an open file, or a large
+    blob downloaded by AzureBlobClient.get_pdf_stream), or None if it is held in memory.
+    """
+    path = getattr(pdf_stream, "name", None)
+    return path if isinstance(path, str) and os.path.isfile(path) else None
+
+def extract_text_from_pdf_stream(pdf_stream, page_numbers=None):
+    """
+    Extracts text from a file-like PDF stream using PyMuPDF.
+    Reading over _PARALLEL_PAGE_THRESHOLD pages is spread across parallel processes.
+    Raises ValueError if the PDF is empty, fails to be read, or a page number is negative.
+
+    Args:
+        pdf_stream: A readable binary file-like object holding the PDF. If it is
+            backed by a named file on disk, the PDF is opened by path rather
+            than read into memory.
+        page_numbers (Sequence[int], optional): 0-based pages to extract, in the
+            order given (e.g. range(10) for up to the first ten pages). Pages past
+            the end of the PDF are skipped; other pages are never parsed.
+            Defaults to every page.
     """
     import logging
-    from PyPDF2 import PdfReader
     logger = logging.getLogger(__name__)
 
+    doc = None
     try:
-        reader = PdfReader(pdf_stream)
-        text = ""
-        for i, page in enumerate(reader.pages):
-            try:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text
-                else:
-                    logger.warning(f"No text found on page {i+1}.")
-            except Exception as page_error:
+        pdf_path = _pdf_path(pdf_stream)
+        if pdf_path is not None:
+            # PyMuPDF reads the pages it needs from disk; no full in-memory copy.
+            pdf_bytes = None
+            doc = pymupdf.open(pdf_path, filetype="pdf")
+        else:
+            pdf_bytes = pdf_stream.read()
+            doc = pymupdf.open(stream=pdf_bytes, filetype="pdf")
+        if page_numbers is None:
+            page_numbers = range(doc.page_count)
+        page_numbers = list(page_numbers)
+        for i in page_numbers:
+            if i < 0:
+                raise ValueError(f"Page {i} is out of range; page numbers start at 0.")
+        # Clip to the document, so range(10) also works for shorter PDFs.
+        page_numbers = [i for i in page_numbers if i < doc.page_count]
+
+        if len(page_numbers) > _PARALLEL_PAGE_THRESHOLD and (os.cpu_count() or 1) > 1:
+            if pdf_path is not None:
+                pages = _read_pages_parallel(pdf_path, page_numbers)
+            else:
+                # Workers open the PDF from disk rather than receiving a copy each.
+                with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+                    tmp.write(pdf_bytes)
+                try:
+                    pages = _read_pages_parallel(tmp.name, page_numbers)
+                finally:
+                    os.remove(tmp.name)
+        else:
+            pages = [_read_page(doc.load_page(i)) for i in page_numbers]
+
+        parts = []
+        for i, (page_text, page_error) in zip(page_numbers, pages):
+            if page_error is not None:
                 logger.error(f"Error reading page {i+1}: {page_error}")
+            elif page_text:
+                parts.append(page_text)
+            else:
+                logger.warning(f"No text found on page {i+1}.")
 
         # Distinguish empty text from other errors
-        if not text.strip():
+        if not any(part.strip() for part in parts):
             # Raise a specific ValueError that your test looks for
             raise ValueError("The PDF appears to have no extractable text.")
 
         logger.info("Text successfully extracted from the PDF stream.")
-        return text
+        return "".join(parts)
 
     except ValueError as e:
         # If we've already raised "The PDF appears to have no extractable text."
@@ -59,6 +205,33 @@ def extract_text_from_pdf_stream(pdf_stream):
         logger.error(f"Failed to extract text from PDF stream: {e}")
         raise ValueError("Could not process the PDF stream.") from e
 
+    finally:
+        # Release the MuPDF document handle.
+        if doc is not None:
+            doc.close()
+
+
+def _build_splitter_embed_model(default_model):
+    """
+    Returns the embedding model the semantic splitter uses to find chunk
+    boundaries. The splitter embeds every sentence group, so setting
+    config.SPLITTER_EMBED_MODEL to a local sentence-transformers model (e.g.
+    "sentence-transformers/all-MiniLM-L6-v2") replaces those Azure OpenAI calls
+    with CPU inference; Azure is then only used for the final chunk embeddings.
+    Requires the optional llama-index-embeddings-huggingface package.
+    """
+    model_name = config.SPLITTER_EMBED_MODEL
+    if not model_name:
+        return default_model
+    try:
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+    except ImportError as e:
+        raise ImportError(
+            "SPLITTER_EMBED_MODEL requires the llama-index-embeddings-huggingface package."
+        ) from e
+    logger.info(f"Using local embedding model '{model_name}' for semantic splitting.")
+    return HuggingFaceEmbedding(model_name=model_name)
+
 
 class PDFChunker:
     """
@@ -66,12 +239,27 @@ class PDFChunker:
     and LlamaIndex's SemanticSplitterNodeParser for semantic chunking.
     """
 
-    def __init__(self):
+    def __init__(self, cache_path: str = None, strategy: str = None):
         """
         Initializes the PDFChunker with an Azure OpenAI embedding model
-        and a semantic splitter.
+        and a splitter.
+
+        Args:
+            cache_path (str, optional): SQLite file for the persistent chunk cache.
+                Defaults to config.CHUNK_CACHE_PATH; if empty, caching is disabled.
+            strategy (str, optional): "semantic" (embedding-based chunk boundaries)
+                or "token" (fixed token windows; no embedding calls until the final
+                chunks). Defaults to config.CHUNK_STRATEGY.
+
+        Raises:
+            ValueError: If strategy is not one of the supported strategies.
         """
         try:
+            strategy = strategy or config.CHUNK_STRATEGY
+            if strategy not in _CHUNK_STRATEGIES:
+                raise ValueError(f"Unknown chunking strategy '{strategy}'; expected one of {_CHUNK_STRATEGIES}.")
+            self.strategy = strategy
+
             # Azure OpenAI embeddings
             self.embed_model = AzureOpenAIEmbedding(
                 model=config.AZURE_OPENAI_EMBEDDING_NAME,
@@ -79,23 +267,100 @@ class PDFChunker:
                 api_key=config.AZURE_OPENAI_API_KEY,
                 azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
                 api_version=config.AZURE_OPENAI_MODEL_VERSION,
+                embed_batch_size=_EMBED_BATCH_SIZE,
             )
 
-            # Semantic splitter for chunking
-            self.splitter = SemanticSplitterNodeParser.from_defaults(
-                buffer_size=1,
-                breakpoint_percentile_threshold=95,
-                embed_model=self.embed_model
-            )
+            if strategy == "token":
+                # Token-window splitter: tokenization only, no embedding calls
+                self.splitter = SentenceSplitter(
+                    chunk_size=_TOKEN_CHUNK_SIZE,
+                    chunk_overlap=_TOKEN_CHUNK_OVERLAP,
+                    tokenizer=get_tokenizer(),
+                )
+            else:
+                # Semantic splitter for chunking
+                self.splitter = SemanticSplitterNodeParser.from_defaults(
+                    buffer_size=1,
+                    breakpoint_percentile_threshold=95,
+                    embed_model=_build_splitter_embed_model(self.embed_model)
+                )
+
+            cache_path = cache_path if cache_path is not None else config.CHUNK_CACHE_PATH
+            self.chunk_cache = ChunkCache(cache_path) if cache_path else None
+            # Everything that shapes the cached chunks or vectors; the splitter
+            # model only moves chunk boundaries under the semantic strategy.
+            self._cache_namespace = f"{config.AZURE_OPENAI_EMBEDDING_NAME}/{strategy}"
+            if strategy == "semantic":
+                self._cache_namespace += f"/{config.SPLITTER_EMBED_MODEL}"
             logger.info("PDFChunker initialized successfully.")
         except Exception as e:
             logger.error(f"Error initializing PDFChunker: {e}")
             raise
 
+    def _embed_shard(self, shard, offset: int, filename: str = ""):
+        """
+        Embeds a shard of up to _EMBED_BATCH_SIZE chunk texts in one request.
+        If the batched request fails, falls back to embedding the shard's chunks
+        one by one, so a single bad chunk doesn't lose the whole shard.
+
+        Args:
+            shard (list[str]): The chunk texts to embed.
+            offset (int): Index of the shard's first chunk (for logging).
+            filename (str, optional): The associated filename for logging.
+
+        Returns:
+            list: One embedding per chunk, or None where a chunk failed.
+        """
+        try:
+            return self.embed_model.get_text_embedding_batch(shard, show_progress=False)
+        except Exception as batch_err:
+            logger.warning(
+                f"Batch embedding failed for chunks {offset}-{offset + len(shard) - 1} "
+                f"in file {filename}: {batch_err}. Retrying chunks individually."
+            )
+
+        embeddings = []
+        for i, content in enumerate(shard, start=offset):
+            try:
+                embeddings.append(self.embed_model.get_text_embedding(content))
+            except Exception as emb_err:
+                logger.warning(f"Error embedding chunk {i} in file {filename}: {emb_err}")
+                embeddings.append(None)
+        return embeddings
+
+    def _embed_shards(self, shards, filename: str = ""):
+        """
+        Embeds (offset, texts) shards with up to config.EMBED_MAX_CONCURRENCY
+        requests in flight, keeping the embeddings in chunk order.
+
+        Args:
+            shards (list[tuple[int, list[str]]]): The shards and their first chunk index.
+            filename (str, optional): The associated filename for logging.
+
+        Returns:
+            list: One embedding (or None) per chunk, across all shards.
+        """
+        if len(shards) <= 1:
+            results = [self._embed_shard(shard, start, filename) for start, shard in shards]
+        else:
+            max_workers = max(1, min(config.EMBED_MAX_CONCURRENCY, len(shards)))
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = []
+                for start, shard in shards:
+                    time.sleep(random.uniform(0, _EMBED_SUBMIT_JITTER_S))
+                    futures.append(pool.submit(self._embed_shard, shard, start, filename))
+                # _embed_shard handles its own errors, so result() does not raise.
+                results = [future.result() for future in futures]
+
+        return [embedding for shard_embeddings in results for embedding in shard_embeddings]
+
     def chunk_text(self, text: str, filename: str = ""):
         """
         Splits the given text into semantically meaningful chunks,
-        computes embeddings, and returns a list of nodes with embeddings.
+        computes embeddings (in concurrent batches of _EMBED_BATCH_SIZE),
+        and returns a list of nodes with embeddings. If the same text was
+        chunked before and a chunk cache is configured, the cached chunks
+        are returned instead.
 
         Args:
             text (str): The raw text to be chunked.
@@ -109,20 +374,39 @@ class PDFChunker:
                 logger.warning(f"Text is empty or invalid for file: {filename}.")
                 return []
 
+            cache_key = None
+            chunk_cache = self.chunk_cache
+            if chunk_cache is not None:
+                cache_key = ChunkCache.key(text, self._cache_namespace)
+                cached = chunk_cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"Loaded {len(cached)} cached chunks for file: {filename}")
+                    return [
+                        TextNode(text=content, embedding=embedding, metadata={"filename": filename})
+                        for content, embedding in cached
+                    ]
+
             documents = [Document(text=text, metadata={"filename": filename})]
             nodes = self.splitter.get_nodes_from_documents(documents)
+            contents = [node.get_content() for node in nodes]
             valid_nodes = []
 
-            for i, node in enumerate(nodes):
-                try:
-                    chunk_embedding = self.embed_model.get_text_embedding(node.get_content())
-                    if chunk_embedding is not None:
-                        node.embedding = chunk_embedding
-                        valid_nodes.append(node)
-                    else:
-                        logger.warning(f"Null embedding for chunk {i} in file {filename}.")
-                except Exception as emb_err:
-                    logger.warning(f"Error embedding chunk {i} in file {filename}: {emb_err}")
+            shards = [
+                (start, contents[start:start + _EMBED_BATCH_SIZE])
+                for start in range(0, len(contents), _EMBED_BATCH_SIZE)
+            ]
+            embeddings = self._embed_shards(shards, filename)
+
+            for i, (node, chunk_embedding) in enumerate(zip(nodes, embeddings)):
+                if chunk_embedding is not None:
+                    node.embedding = chunk_embedding
+                    valid_nodes.append(node)
+                else:
+                    logger.warning(f"Null embedding for chunk {i} in file {filename}.")
+
+            # Only complete results are cached, so failed chunks are retried next time.
+            if chunk_cache is not None and valid_nodes and len(valid_nodes) == len(nodes):
+                chunk_cache.put(cache_key, [(node.get_content(), node.embedding) for node in valid_nodes])
 
             logger.info(f"Created {len(valid_nodes)} valid chunks for file: {filename}")
             return valid_nodes
@@ -0,0 +1,65 @@
+"""
+ttl_cache.py
+
+Implements a small thread-safe LRU cache whose entries expire after a
+time-to-live. Used to keep short-lived, in-process copies of results from
+remote services (e.g. Azure Cognitive Search) for repeated requests.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    A size-bounded LRU mapping whose entries expire `ttl` seconds after they are stored.
+    All operations are guarded by a lock so the cache can be shared across threads.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        """
+        Args:
+            maxsize (int): Maximum number of entries; the least recently used is evicted first.
+            ttl (float): Seconds an entry stays valid after it is stored.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for key, or default if it is missing or expired.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """
+        Stores value under key, evicting the least recently used entries beyond maxsize.
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)